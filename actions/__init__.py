@@ -1,3 +1,5 @@
+import pandas as pd
+
 '''
 	Random useful methods that don't necessarily fit into a specific classification.
 '''
@@ -26,4 +28,50 @@ def merge_dictionaries(dict1, dict2):
 			else:
 				result[key] = value
 
-	return result
\ No newline at end of file
+	return result
+
+
+def concat(frames, **kwargs):
+	'''
+		pd.concat, except that a column that is categorical in any of the frames stays categorical
+		(pd.concat turns it into an object column unless every frame has exactly the same categories),
+		by first giving every frame that has the column the union of the categories.
+	'''
+	frames = list(frames)
+
+	for col in set().union(*[df.columns for df in frames]) if len(frames) > 1 else []:
+		columns = [df[col] for df in frames if col in df.columns]
+
+		if not any(isinstance(column.dtype, pd.CategoricalDtype) for column in columns):
+			continue
+
+		categories = pd.Index([])
+		for column in columns:
+			categories = categories.union(column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else pd.Index(column.dropna().unique()))
+
+		frames = [df.copy(deep=False) for df in frames]
+		for df in frames:
+			if col in df.columns:
+				df[col] = df[col].cat.set_categories(categories) if isinstance(df[col].dtype, pd.CategoricalDtype) else pd.Categorical(df[col], categories=categories)
+
+	return pd.concat(frames, **kwargs)
+
+
+def to_minor_units(series, scale=100):
+	'''
+		Amounts as int64 minor units (e.g. kobo with a scale of 100), rounded to the nearest minor unit.
+		Columns with missing amounts become nullable Int64 columns.
+
+		Raises:
+			ValueError: If an amount is not a number.
+	'''
+	amounts = (pd.to_numeric(series).astype(float) * scale).round()
+
+	return amounts.astype("Int64" if amounts.isna().any() else "int64")
+
+
+def from_minor_units(series, scale=100):
+	'''
+		Amounts in minor units as decimals (float64), for writing and displaying them.
+	'''
+	return series.astype(float) / scale
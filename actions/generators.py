@@ -1,38 +1,109 @@
+import numpy
 import pandas
 
 '''
 	Methods and lambda functions defined in this file are used for creating calculated rows
 
+	A generator takes a row and returns the value of the calculated column for that row.
+	Generators decorated with @vectorized also carry a column-level implementation which takes the
+	whole dataframe and returns the calculated column at once; create_calculated_column prefers it
+	over applying the generator row by row.
+
 '''
 
-zero = lambda x: 0
+
+def vectorized(column_func):
+	'''
+		Attaches column_func, a function of the dataframe returning a Series (or a scalar), to a row generator.
+		It must produce exactly what applying the row generator to every row would.
+	'''
+	def decorator(row_func):
+		row_func.vectorized = column_func
+		return row_func
+
+	return decorator
+
+
+def text(series):
+	'''
+		The values of a column as the strings an f-string would produce for them. Missing values are
+		rendered as "nan" whatever the type of the column (e.g. <NA> in Arrow backed string columns).
+	'''
+	return series.astype(object).where(series.notna(), numpy.nan).astype(str)
+
+
+def row_values(df):
+	'''
+		df with the columns whose missing values are <NA> (e.g. Arrow backed strings) as objects holding NaN, so a
+		generator applied row by row renders missing values as "nan", as text() does. df itself is returned when
+		there are none.
+	'''
+	columns = [col for col in df.columns if pandas.api.types.is_extension_array_dtype(df[col].dtype) and not isinstance(df[col].dtype, pandas.CategoricalDtype)]
+
+	if not columns:
+		return df
+
+	return df.assign(**{col: df[col].astype(object).where(df[col].notna(), numpy.nan) for col in columns})
+
+
+@vectorized(lambda df: 0)
+def zero(row):
+	return 0
+
 
 format_amt_str = lambda x: str(x)
 
 
-def spb_remark_generator(row): 
+def _spb_remark(df):
+	return "RRN " + text(df['retrieval_reference_nr']) + " AUTH " + text(df['auth_id']) + " STAN " + text(df['stan']) + " PAN " + text(df['pan']) + " " + text(df['terminal_id']) + " " + text(df['settlement_impact']) + " " + text(df['trxn_category'])
+
+
+@vectorized(_spb_remark)
+def spb_remark_generator(row):
 	return f"RRN {row['retrieval_reference_nr']} AUTH {row['auth_id']} STAN {row['stan']} PAN {row['pan']} {row['terminal_id']} {row['settlement_impact']} {row['trxn_category']}"
 
 
+@vectorized(lambda df: text(df['retrieval_reference_nr']) + text(df['terminal_id']))
 def spb_tx_id_generator(row):
 	return f"{row['retrieval_reference_nr']}{row['terminal_id']}"
 
 
 
 #For LEDGER
+def _ledger_remark(df):
+	terminal = "RRN " + text(df['rrn']) + " AUTH " + text(df['auth.code']) + " STAN " + text(df['stan']) + " PAN " + text(df['pan.number']) + " " + text(df['terminal.id']) + " " + text(df['amt.lcy'])
+	manual = text(df['our.ref']) + " " + text(df['narrative'])
+
+	return terminal.where(df['at.unique.id'].notna(), manual)
+
+
+@vectorized(_ledger_remark)
 def ledger_remark_generator(row):
 	if pandas.notnull(row['at.unique.id']):
 		#For entries from the terminal
-		return f"RRN {row['rrn']} AUTH {row['auth.code']} STAN {row['stan']} PAN {row['pan.number']} {row['terminal.id']} {row['amt.lcy']}" 
+		return f"RRN {row['rrn']} AUTH {row['auth.code']} STAN {row['stan']} PAN {row['pan.number']} {row['terminal.id']} {row['amt.lcy']}"
 	else:
 		#For manual posting
 		return f"{row['our.ref']} {row['narrative']}"
 
 
-def ledger_stan_generator(row): 
+@vectorized(lambda df: text(df['at.unique.id']).str[2:8].where(df['at.unique.id'].notna(), ''))
+def ledger_stan_generator(row):
 	return str(row['at.unique.id'])[2:8] if pandas.notnull(row['at.unique.id']) else ''
 
 
+def _ledger_tx_id(df):
+	return pandas.Series(
+		numpy.select(
+			[df['rrn'].notna(), df['our.ref'].notna()],
+			[text(df['rrn']) + text(df['terminal.id']), text(df['our.ref'])],
+			default='',
+		),
+		index=df.index,
+	)
+
+
+@vectorized(_ledger_tx_id)
 def ledger_tx_id_generator(row):
 	if pandas.notnull(row['rrn']):
 		#For entries from the terminal
@@ -45,4 +116,12 @@ def ledger_tx_id_generator(row):
 
 
 def generate_from_combination(column_names):
-	return lambda row: ''.join([str(row[item]) for item in column_names if pandas.notnull(row[item])])
\ No newline at end of file
+	def combine(df):
+		combined = pandas.Series('', index=df.index, dtype=object)
+
+		for item in column_names:
+			combined = combined + text(df[item]).where(df[item].notna(), '')
+
+		return combined
+
+	return vectorized(combine)(lambda row: ''.join([str(row[item]) for item in column_names if pandas.notnull(row[item])]))
@@ -1,4 +1,7 @@
+import numpy as np
 import pandas as pd
+from document_reconciliation.actions import concat, from_minor_units
+from document_reconciliation.actions import generators
 
 '''
 	Methods defined in this file are used to transform DataFrames in some way.
@@ -6,6 +9,32 @@ import pandas as pd
 '''
 
 
+def pushdown(condition=None):
+	'''
+		Marks a mutation as safe to be applied to each chunk of a file while it is being read,
+		i.e. it only filters rows or selects/renames columns and never needs the whole dataframe.
+
+		condition (callable): Optional. Called with the params of the mutation and returns whether
+		that particular use of the mutation can be pushed down.
+	'''
+	def decorator(func):
+		func.pushdown = condition or (lambda **params: True)
+		return func
+
+	return decorator
+
+
+def barrier(func):
+	'''
+		Marks a mutation as needing the complete dataframe (e.g. sorting, removing duplicates, totals),
+		so it is never split into chunks for the pool. It is applied in the main process instead.
+	'''
+	func.barrier = True
+	return func
+
+
+#Renaming the columns can be pushed down, calculating a column with a row function is left to the pool.
+@pushdown(lambda **params: not params.get("col"))
 def transform_cols(df, **kwargs):
 	action = kwargs.get("action")
 	col = kwargs.get("col")
@@ -18,6 +47,7 @@ def transform_cols(df, **kwargs):
 			
 	return df
 
+@pushdown()
 def filter_entries(df, **kwargs):
 	filter_on_col = kwargs.get("filter_on")
 	include_only = kwargs.get("include_only")
@@ -33,6 +63,7 @@ def filter_entries(df, **kwargs):
 	return df
 
 
+@pushdown()
 def include_only_cols(df,  **kwargs):
 	include_only = kwargs.get("include_only")
 
@@ -46,39 +77,116 @@ def create_calculated_column(df, **kwargs):
 	col = kwargs.get("col_name")
 	generator = kwargs.get("generator")
 	
+	memoize_on = kwargs.get("memoize_on")
+
 	if col and generator:
-		df = transform_cols(df, col=col, action=generator, **kwargs)
+		#Generators see amounts held in minor units (see Document.amounts) as decimals, as they were read
+		source = decimal_amounts(df, kwargs.get("amounts"))
+
+		#Generators with a column-level implementation (see generators.vectorized) skip the row by row apply
+		if getattr(generator, "vectorized", None):
+			df[col] = generator.vectorized(source)
+		elif memoize_on and len(df) > 0:
+			df[col] = apply_distinct(generators.row_values(source), generator, memoize_on)
+		else:
+			df[col] = transform_cols(generators.row_values(source).copy(deep=False), col=col, action=generator, **kwargs)[col]
 
 	return df
 
 
+def decimal_amounts(df, amounts=None):
+	'''
+		A shallow copy of df with the amount columns in "amounts" (column name: minor units per unit of currency)
+		converted back to decimals. df itself is returned when there are none.
+	'''
+	columns = [col for col in df.columns if col.lower() in (amounts or {})]
+
+	if not columns:
+		return df
+
+	return df.assign(**{col: from_minor_units(df[col], amounts[col.lower()]) for col in columns})
+
+
+def apply_distinct(df, generator, columns):
+	'''
+		Applies a row generator once per distinct combination of values in "columns" and maps the results
+		back to every row, so the cost scales with the number of distinct inputs rather than the number of rows.
+
+		"columns" must contain every column the generator reads.
+	'''
+	#Each column is factorized with missing values as a value of their own: grouping on several columns with
+	#dropna=False gives no group to the rows where a categorical column is missing
+	codes = np.column_stack([pd.factorize(df[col], use_na_sentinel=False)[0] for col in columns])
+
+	_, first, inverse = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+
+	values = df.iloc[first].apply(generator, axis=1).to_numpy()
+
+	return values[inverse]
+
+
+@barrier
 def create_row(df, **kwargs):
 	row = kwargs.get("row")
 
 	if row:
-		df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+		df = concat([df, pd.DataFrame([row])], ignore_index=True)
 	
 	return df
 
 
+def parse_dates(series, input_format=None):
+	'''
+		Parses a column to datetime64, parsing each distinct value only once.
+
+		input_format (str): Optional. The strptime format of the values, which is much faster than letting
+		pandas infer it. If any value does not match, the format is inferred instead.
+	'''
+	if pd.api.types.is_datetime64_any_dtype(series):
+		return series
+
+	codes, uniques = pd.factorize(series)
+
+	try:
+		parsed = pd.to_datetime(uniques, format=input_format)
+	except (ValueError, TypeError):
+		parsed = pd.to_datetime(uniques)
+
+	#Missing values get the code -1, which picks the NaT appended at the end
+	values = np.append(parsed.values, np.datetime64('NaT')).astype(parsed.values.dtype)
+
+	return pd.Series(values[codes], index=series.index, name=series.name)
+
+
 def format_date_time(df, **kwargs):
+	'''
+		Parses date columns to datetime64 and formats them with "dt_format".
+
+		If "defer" is set the columns are left as datetime64, to be formatted when they are written
+		(i.e. with the "date_format" write option of the output).
+	'''
 	col = kwargs.get("col_name")
 	cols = kwargs.get("col_names")
-	dt_format = kwargs.get("df_format")
+	dt_format = kwargs.get("dt_format", kwargs.get("df_format"))
+	input_format = kwargs.get("input_format")
+	defer = kwargs.get("defer", False)
+
+	columns = [col] if col else []
 
-	if dt_format:
-		if col:
-			df[col] = pd.to_datetime(df[col])
-			df[col] = df[col].dt.strftime(dt_format)
+	if cols and isinstance(cols, list):
+		columns += cols
 
-		if cols and isinstance(cols, list):
-			for c in cols:
-				df[c] = pd.to_datetime(df[c])
+	if dt_format or defer:
+		for c in columns:
+			df[c] = parse_dates(df[c], input_format)
+
+			if not defer:
 				df[c] = df[c].dt.strftime(dt_format)
 
 	return df
 
 
+@barrier
 def create_total_amount_row(df, **kwargs):
 
 	try:
@@ -105,6 +213,27 @@ def create_total_amount_row(df, **kwargs):
 	return df
 
 
+@barrier
+def sort_entries(df, **kwargs):
+	by = kwargs.get("by")
+	ascending = kwargs.get("ascending", True)
+
+	if by:
+		df = df.sort_values(by=by, ascending=ascending)
+
+	return df
+
+
+@barrier
+def drop_duplicate_entries(df, **kwargs):
+	subset = kwargs.get("subset")
+	keep = kwargs.get("keep", "first")
+
+	df = df.drop_duplicates(subset=subset, keep=keep)
+
+	return df
+
+
 def format_amount_2fp(df, **kwargs):
 	col = kwargs.get("col", None)
 
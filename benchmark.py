@@ -0,0 +1,150 @@
+import io
+import argparse
+import contextlib
+from copy import deepcopy
+from time import perf_counter
+
+from document_reconciliation.core.reconcile.utilities import ReconciliationUtilities
+from document_reconciliation.core.documents.document import Document
+from document_reconciliation.core.documents import engines
+from document_reconciliation.core import executor
+import document_reconciliation.actions.mutations as mutate
+import document_reconciliation.sequence as sequence
+
+from document_reconciliation import __RECON_SETTINGS_MODULE__ as config
+
+
+'''
+	Compares the reader engines (see core.documents.engines) on real input files.
+
+		python -m document_reconciliation.benchmark ledger /path/to/ledger.csv --engines pandas pyarrow --repeat 3
+
+	The file is read as the input it is named for (with its read options, schema, ingest config and read mutations)
+	once per repeat with each engine, with the cache disabled. The best time of the repeats is reported, with the
+	number of rows and whether the engine gave the same dataframe as pandas.
+
+		python -m document_reconciliation.benchmark atm /path/to/spb_0.csv --generators spb
+
+	With --generators, the steps of a sequence (see sequence.py) are then applied to the dataframe read with pandas,
+	and each column calculated by a generator with a column-level implementation is compared with the column the
+	generator gives applied row by row, and once per distinct row.
+'''
+
+
+def definition(name):
+	'''
+		The definition of the input "name" in PROCESS_INPUTS, with the configuration of its groups applied.
+	'''
+	inputs = ReconciliationUtilities(config).settings.PROCESS_INPUTS
+
+	for category in ("files", "folders"):
+		if name in inputs.get(category, {}):
+			return inputs[category][name]
+
+	raise KeyError(f"No input named {name} in PROCESS_INPUTS")
+
+
+def read(name, path, engine):
+	'''
+		Reads path as the input "name" with engine. Returns the document, the seconds it took and whether
+		the engine fell back to pandas.
+	'''
+	doc_def = deepcopy(definition(name))
+	doc_def.pop("files", None)
+	doc_def["path"] = path
+	engine = None if engine == "pandas" else engine
+
+	#The sections of a workbook are read with engines of their own
+	for input_def in [doc_def] + list(doc_def.get("sections", {}).values()):
+		input_def.setdefault("config", {}).setdefault("ingest", {})["engine"] = engine
+
+	output = io.StringIO()
+
+	with contextlib.redirect_stdout(output):
+		start = perf_counter()
+		doc = Document(dict({name: doc_def}))
+		elapsed = perf_counter() - start
+
+	return doc, elapsed, "reading with pandas instead" in output.getvalue()
+
+
+def equal(df, reference):
+	return df.equals(reference) and list(df.dtypes) == list(reference.dtypes)
+
+
+def check_generators(doc, steps):
+	'''
+		Applies steps to the dataframe of doc, comparing the column of each generator with a column-level implementation
+		(see generators.vectorized) with what applying it row by row and once per distinct row gives, before each is applied.
+	'''
+	df = doc.dataframe.copy()
+
+	print(f"{'column':<28}{'row by row':>12}{'distinct':>12}")
+
+	for step in deepcopy(steps):
+		params = step.get("params", {})
+		generator = params.get("generator")
+
+		if step["action"] is mutate.create_calculated_column and getattr(generator, "vectorized", None):
+			#The same generator without its column-level implementation
+			row_wise = lambda row, generator=generator: generator(row)
+
+			variants = [{}, {"generator": row_wise, "memoize_on": None}, {"generator": row_wise, "memoize_on": params.get("memoize_on") or list(df.columns)}]
+			columns = [doc._bind_mutation(dict(step, params=dict(params, **variant)))(df.copy())[params["col_name"]].astype(object) for variant in variants]
+
+			print(f"{params['col_name']:<28}" + "".join(f"{'yes' if column.equals(columns[0]) else 'no':>12}" for column in columns[1:]))
+
+		df = doc._bind_mutation(step)(df)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Compare the reader engines on an input file.")
+	parser.add_argument("input", help="The name of the input in PROCESS_INPUTS (e.g. ledger, atm).")
+	parser.add_argument("path", help="The file to read.")
+	parser.add_argument("--engines", nargs="+", default=["pandas"] + list(engines.ENGINES.keys()))
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--generators", help="The sequence (see sequence.py) whose generators to check, e.g. ledger or spb.")
+	args = parser.parse_args()
+
+	#Every run must actually read the file
+	config.CACHE = dict(getattr(config, "CACHE", {}) or {}, path=None)
+
+	#Start the pool before timing anything, its start up would be counted against the first engine
+	executor.get_pool()
+
+	reference = None
+
+	print(f"{'engine':<12}{'seconds':>10}{'rows':>10}  same as pandas")
+
+	for engine in args.engines:
+		if engine != "pandas" and engines.get_engine(engine, args.path) is None:
+			print(f"{engine:<12}{'-':>10}{'-':>10}  not installed or doesn't read this format")
+			continue
+
+		times = []
+
+		for _ in range(args.repeat):
+			doc, elapsed, fell_back = read(args.input, args.path, engine)
+			times.append(elapsed)
+
+		#The sheets of a sectioned document, or the document itself
+		frames = [section.dataframe for section in doc.sections.values()] if doc.has_sections else [doc.dataframe]
+
+		if reference is None and engine == "pandas":
+			reference = frames
+
+		same = "-" if reference is None else ("yes" if all(equal(df, ref) for df, ref in zip(frames, reference)) else "no")
+
+		print(f"{engine:<12}{min(times):>10.3f}{sum(len(df) for df in frames):>10}  {same}{' (fell back to pandas)' if fell_back else ''}")
+
+	if args.generators:
+		print()
+		check_generators(read(args.input, args.path, "pandas")[0], getattr(sequence, f"{args.generators}_sequence"))
+
+	executor.shutdown()
+
+
+
+
+if __name__ == '__main__':
+	main()
@@ -17,12 +17,73 @@ PROCESS_DESC = "Description of what this process does."
 #A name to access the default sheet that was read when no sheets were specified.
 default_document_section = "__default__"
 
+
+
+'''
+	The pool of worker processes shared by all documents for applying mutations.
+		"processes": The number of worker processes. None to use one per CPU core.
+		"start_method": The multiprocessing start method, "forkserver" is used where available.
+		"preload": Modules imported once by the forkserver instead of by every worker.
+		"fuse_mutations": Send each chunk to the pool once and run every mutation of a sequence on it there,
+			rather than making a trip per mutation. Barrier mutations (see mutate.barrier) split the sequence.
+		"parallel_reads": Read the files of the input folders concurrently, the largest first.
+		"shared_memory": Pass chunks to and from the workers in shared memory blocks, sending only a descriptor of
+			each block through the pool, instead of pickling the chunks through its pipes.
+'''
+EXECUTOR = {
+	"processes": 4,
+	"start_method": "forkserver",
+	"preload": [
+		"pandas",
+		"document_reconciliation.actions.mutations",
+		"document_reconciliation.actions.generators",
+	],
+	"fuse_mutations": True,
+	"parallel_reads": True,
+	"shared_memory": True,
+}
+
+
+'''
+	An on-disk cache of the documents as read and mutated (see core.cache), so rerunning the same inputs only
+	re-reads the files whose content, read options or read mutations changed. Needs pyarrow.
+		"path": The cache directory. None to disable the cache.
+		"max_bytes": The least recently used entries are evicted to keep the cache under this size. None for no limit.
+		"incremental": Keep a manifest (path, size, mtime and hash) of the files of the input folders, so that files
+			unchanged since a previous run are loaded from the cache without being hashed or parsed.
+'''
+CACHE = {
+	"path": None,
+	"max_bytes": 2 * 1024 ** 3,
+	"incremental": False,
+}
+
+
+'''
+	How amounts are held.
+		"minor_units": Convert the amount columns of each input ("amount_cols" in its "ingest" config) to int64 minor
+			units (e.g. kobo) as they are read, for exact integer arithmetic. They are rendered as decimals when written.
+		"scale": The number of minor units in one unit of currency.
+'''
+AMOUNTS = {
+	"minor_units": False,
+	"scale": 100,
+}
+
 '''
 	Level 1:
 		files:  An object which the supplied input will be the path to an excel file
 			files[file_name]: (e.g. "ledger", "prev_unrec") an object containing definitions on the file named in by it's key.
 				files[file_name]["info"]: A text description of the file.
 				files[file_name]["config"]: An object containing definitions for different libraries should work with this file.
+					files[file_name]["config"]["ingest"]["memory_limit"]: The maximum number of bytes a chunked read may accumulate before it is aborted.
+					files[file_name]["config"]["ingest"]["report_memory"]: Print the memory used by each column as read, and as Python objects.
+					files[file_name]["config"]["ingest"]["amount_cols"]: The amount columns, held in integer minor units if AMOUNTS["minor_units"] is set.
+					files[file_name]["config"]["ingest"]["engine"]: The reader engine for the file, e.g. "pyarrow" for CSVs or "calamine" for workbooks
+						(see core.documents.engines). The file is read with pandas if the engine is not installed.
+					files[file_name]["config"]["ingest"]["mmap"]: Memory-map a delimited file and have the workers parse it in byte ranges aligned on
+						line boundaries, in parallel, when no engine reads it. The file must not have line breaks within quoted values.
+					files[file_name]["config"]["ingest"]["range_bytes"]: The size of the byte ranges of a memory-mapped file (64MB by default).
 				files[file_name]["mutations"]: An object containing definition of functions that should be executed on this file.
 					files[file_name]["mutations"]["read"]: An ordered array of functions to be executed on this file after it is read.
 					files[file_name]["mutations"]["join"]: An ordered array of functions to be executed when this file is being joined with another file.
@@ -42,6 +103,14 @@ PROCESS_INPUTS = {
 					"read": {},
 					"write": {},
 				},
+				"ingest": {
+					"memory_limit": None,
+					"report_memory": False,
+					"amount_cols": [],
+					"engine": None,
+					"mmap": False,
+					"range_bytes": None,
+				},
 			},
 			"mutations": {
 				"read": [],
@@ -0,0 +1,256 @@
+'''
+	An on-disk cache of documents as read and mutated, stored as Parquet files.
+
+	An entry is addressed by the input file (its content hash when it is known, see Manifest, else its path,
+	size, mtime and inode), the options it is read with and a fingerprint of the mutations applied to it on
+	read (including the source of the modules they are defined in), so rerunning the same inputs after a rule
+	was changed only re-reads the documents that rule applies to.
+	The cache directory is kept under a size limit by evicting the least recently used entries.
+
+	It is configured with the "CACHE" definition in the settings module:
+
+		"path": The cache directory ("~" is expanded). None disables the cache.
+		"max_bytes": The size the cache directory is kept under. None for no limit.
+		"incremental": Keep a manifest of the input files (see Manifest) so unchanged files are loaded from
+			the cache without being read at all.
+'''
+
+import os
+import sys
+import hashlib
+import inspect
+import uuid
+import types
+from functools import partial
+
+import pandas as pd
+
+try:
+	import pyarrow
+except ImportError:
+	pyarrow = None
+
+from document_reconciliation import __RECON_SETTINGS_MODULE__ as __SETTINGS_MODULE__
+from document_reconciliation.core.documents import compression
+
+
+SUFFIX = ".parquet"
+
+#Hashes of the source files of the modules mutations are defined in, by module name
+_module_hashes = {}
+
+#Whether the cache being unavailable without pyarrow was reported
+_warned = False
+
+
+def _config():
+	return getattr(__SETTINGS_MODULE__, "CACHE", {}) or {}
+
+
+def _directory():
+	return os.path.expanduser(_config()["path"])
+
+
+def enabled():
+	'''
+		Whether documents should be cached, which needs a cache directory and pyarrow.
+	'''
+	global _warned
+
+	if not _config().get("path", None):
+		return False
+
+	if pyarrow is None:
+		if not _warned:
+			print("The cache is configured but pyarrow is not installed, documents will not be cached.")
+			_warned = True
+
+		return False
+
+	return True
+
+
+def incremental():
+	'''
+		Whether input files are ingested incrementally, with a manifest kept in the cache directory.
+	'''
+	return enabled() and bool(_config().get("incremental", False))
+
+
+def manifest_path():
+	return os.path.join(_directory(), "manifest.json")
+
+
+def file_hash(path, block_size=1 << 20):
+	'''
+		The hash of the content of a file. A file in an archive is hashed as it is decompressed.
+	'''
+	digest = hashlib.blake2b(digest_size=20)
+
+	with (compression.open_input(path) if compression.is_member(path) else open(path, "rb")) as f:
+		for block in iter(lambda: f.read(block_size), b""):
+			digest.update(block)
+
+	return digest.hexdigest()
+
+
+def file_signature(path):
+	'''
+		The path, size, mtime and inode of a file (of its archive, for a file in an archive), which change when it
+		is rewritten. Cheaper than file_hash, as the file isn't read.
+	'''
+	stat = os.stat(compression.source_file(path))
+
+	return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}"
+
+
+def _module_hash(module_name):
+	if module_name not in _module_hashes:
+		try:
+			source = inspect.getsource(sys.modules[module_name])
+		except (KeyError, TypeError, OSError):
+			source = ""
+
+		_module_hashes[module_name] = hashlib.blake2b(source.encode(), digest_size=20).hexdigest()
+
+	return _module_hashes[module_name]
+
+
+def _describe(obj):
+	'''
+		A stable text description of a (settings) object, for fingerprinting. Functions are described by
+		their name, the source of the module they are defined in and the values they close over.
+	'''
+	if isinstance(obj, dict):
+		return "{" + ", ".join(f"{_describe(key)}: {_describe(value)}" for key, value in sorted(obj.items(), key=lambda item: repr(item[0]))) + "}"
+
+	if isinstance(obj, (list, tuple)):
+		return "[" + ", ".join(_describe(item) for item in obj) + "]"
+
+	if isinstance(obj, types.ModuleType):
+		return f"{obj.__name__}:{_module_hash(obj.__name__)}"
+
+	if isinstance(obj, partial):
+		return f"partial({_describe(obj.func)}, {_describe(obj.args)}, {_describe(obj.keywords)})"
+
+	if callable(obj) and hasattr(obj, "__qualname__"):
+		module = getattr(obj, "__module__", None) or ""
+		closure = [cell.cell_contents for cell in (getattr(obj, "__closure__", None) or [])]
+
+		description = f"{module}.{obj.__qualname__}:{_module_hash(module)}"
+
+		if closure:
+			description += f"({_describe(closure)})"
+
+		if getattr(obj, "vectorized", None):
+			description += f"+{_describe(obj.vectorized)}"
+
+		return description
+
+	return repr(obj)
+
+
+def key(path, *parts, content_hash=None):
+	'''
+		The address of the cache entry of a file read and mutated as described by parts.
+
+		content_hash (str): Optional. The hash of the content of the file, if it is known (see Manifest). The
+		file is addressed by its signature (see file_signature) otherwise, it is never read to address it.
+	'''
+	digest = hashlib.blake2b(digest_size=20)
+
+	digest.update((content_hash or file_signature(path)).encode())
+
+	for part in parts:
+		digest.update(_describe(part).encode())
+
+	return digest.hexdigest()
+
+
+def _entry(cache_key):
+	return os.path.join(_directory(), cache_key + SUFFIX)
+
+
+def load(cache_key):
+	'''
+		Returns the cached dataframe for cache_key, or None if there is none.
+	'''
+	path = _entry(cache_key)
+
+	if not os.path.isfile(path):
+		return None
+
+	try:
+		with pd.option_context("mode.string_storage", "pyarrow"):
+			df = pd.read_parquet(path)
+	except (OSError, ValueError, pyarrow.ArrowException) as e:
+		print(f"Could not load cache entry {path}: {e}")
+		return None
+
+	#Mark the entry as recently used
+	os.utime(path)
+
+	return df
+
+
+def store(cache_key, df):
+	'''
+		Writes df to the cache under cache_key and evicts the least recently used entries if the cache
+		grew past its size limit.
+	'''
+	directory = _directory()
+	os.makedirs(directory, exist_ok=True)
+
+	path = _entry(cache_key)
+	temp = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+
+	try:
+		df.to_parquet(temp)
+		#Readers never see a partly written entry
+		os.replace(temp, path)
+	except (OSError, ValueError, TypeError, pyarrow.ArrowException) as e:
+		print(f"Could not cache {cache_key}: {e}")
+
+		if os.path.exists(temp):
+			os.remove(temp)
+
+		return
+
+	evict()
+
+
+def evict(max_bytes=None):
+	'''
+		Removes the least recently used entries until the cache is no bigger than max_bytes (the "max_bytes"
+		of the CACHE settings by default).
+	'''
+	max_bytes = max_bytes if max_bytes is not None else _config().get("max_bytes", None)
+	directory = _directory() if _config().get("path", None) else None
+
+	if max_bytes is None or not directory or not os.path.isdir(directory):
+		return
+
+	entries = []
+
+	for entry in os.scandir(directory):
+		if entry.name.endswith(SUFFIX):
+			try:
+				stat = entry.stat()
+			except FileNotFoundError:
+				continue
+
+			entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+	total = sum(size for mtime, size, path in entries)
+
+	for mtime, size, path in sorted(entries):
+		if total <= max_bytes:
+			break
+
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			#Evicted by another process
+			pass
+
+		total -= size
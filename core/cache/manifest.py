@@ -0,0 +1,116 @@
+import os
+import json
+import uuid
+
+from document_reconciliation.core.documents import compression
+
+
+'''
+	A manifest of the input files that were already ingested, for incremental runs.
+'''
+
+
+class Manifest(object):
+
+	'''
+		A record of the input files already ingested: their path, size, mtime and content hash.
+
+		A file whose size and mtime haven't changed since it was recorded (those of its archive, for a file in
+		an archive) is taken to still have the same content, so its hash, and with it the address of its document in the cache, is known without reading
+		it. Rerunning over a folder that received new files therefore only hashes and parses the new or
+		changed files; the rest are loaded from the cache as they were ingested. New and changed files are hashed
+		by the workers that read them, and recorded once they are read (see record).
+	'''
+
+	def __init__(self, path):
+
+		self._path = path
+		self._files = {}
+		#The size and mtime of the new and changed files, as they were before they were read
+		self._pending = {}
+		self._changed = False
+
+		try:
+			with open(path) as f:
+				self._files = json.load(f).get("files", {})
+		except FileNotFoundError:
+			pass
+		except (OSError, ValueError) as e:
+			print(f"Could not load the manifest {path}, starting a new one: {e}")
+
+
+
+	@property
+	def path(self):
+		return self._path
+
+
+	@property
+	def files(self):
+		return self._files
+
+
+
+	def is_ingested(self, path):
+		'''
+			Whether the file was recorded with its current size and mtime.
+		'''
+		entry = self.files.get(path)
+
+		if not entry:
+			return False
+
+		stat = os.stat(compression.source_file(path))
+
+		return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+
+
+	def content_hash(self, path):
+		'''
+			The hash of the content of a file from the manifest, or None if the file is new or changed, in which
+			case its size and mtime are noted to be recorded with its hash (see record).
+		'''
+		if self.is_ingested(path):
+			return self.files[path]["hash"]
+
+		self._pending[path] = os.stat(compression.source_file(path))
+
+		return None
+
+
+	def record(self, path, content_hash):
+		'''
+			Records the hash of a new or changed file, hashed as it was read, with the size and mtime it had
+			before it was read: a file that changed in the meantime no longer matches them and is hashed again
+			on the next run.
+		'''
+		stat = self._pending.pop(path, None)
+
+		if stat is None or content_hash is None:
+			return
+
+		self._files[path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": content_hash}
+		self._changed = True
+
+
+	def save(self, ):
+		'''
+			Writes the manifest if it changed, leaving out files that no longer exist.
+		'''
+		files = {path: entry for path, entry in self.files.items() if os.path.isfile(compression.source_file(path))}
+
+		if not self._changed and len(files) == len(self.files):
+			return
+
+		directory = os.path.dirname(self.path) or "."
+		os.makedirs(directory, exist_ok=True)
+
+		temp = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+
+		with open(temp, "w") as f:
+			json.dump({"files": files}, f, indent=1)
+
+		os.replace(temp, self.path)
+
+		self._files = files
+		self._changed = False
@@ -0,0 +1,153 @@
+import io
+import os
+import gzip
+import zipfile
+import contextlib
+
+
+'''
+    Compressed and archived inputs, read without being unpacked to disk.
+
+    A gzip compressed file (e.g. spb_0.csv.gz) is read as the file it holds, decompressed as it is streamed.
+    The files in a zip archive are inputs of their own, addressed by the path of the archive followed by
+    the name of the file in it (e.g. /drops/spb.zip/spb_0.csv), so a folder holding archives is read like
+    a folder holding the files in them (see ReconciliationUtilities.map_args).
+'''
+
+
+ARCHIVE_SUFFIX = ".zip"
+
+# Compressed file suffixes and how to open them as decompressed streams
+COMPRESSED_SUFFIXES = {".gz": gzip.open}
+
+
+def split_member(path):
+    '''
+        Returns (archive, member name) for the path of a file in a zip archive, else (path, None).
+    '''
+    index = path.find(ARCHIVE_SUFFIX + os.sep)
+
+    while index != -1:
+        archive = path[:index + len(ARCHIVE_SUFFIX)]
+
+        if os.path.isfile(archive):
+            # Names in a zip archive are always separated by "/"
+            return archive, path[len(archive) + 1:].replace(os.sep, "/")
+
+        index = path.find(ARCHIVE_SUFFIX + os.sep, index + 1)
+
+    return path, None
+
+
+def is_member(path):
+    return split_member(path)[1] is not None
+
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIX) and zipfile.is_zipfile(path)
+
+
+def is_compressed(path):
+    '''
+        Whether the input has to be decompressed to be read.
+    '''
+    return is_member(path) or path.endswith(tuple(COMPRESSED_SUFFIXES))
+
+
+def members(archive):
+    '''
+        The paths of the files in a zip archive (see split_member), with their uncompressed sizes.
+    '''
+    with zipfile.ZipFile(archive) as zf:
+        # Directories and the metadata macOS adds to archives it creates aren't inputs
+        return {
+            os.path.join(archive, *info.filename.split("/")): info.file_size
+            for info in zf.infolist()
+            if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        }
+
+
+def data_name(path):
+    '''
+        The name of the file an input holds, for telling its format by its extension: the path without the
+        compression suffix (spb_0.csv.gz gives spb_0.csv).
+    '''
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+
+    return path
+
+
+def source_file(path):
+    '''
+        The file on disk that holds the input: the archive for a file in an archive, else the path itself.
+    '''
+    return split_member(path)[0]
+
+
+def exists(path):
+    archive, member = split_member(path)
+
+    if member is None:
+        return os.path.isfile(path)
+
+    with zipfile.ZipFile(archive) as zf:
+        return member in zf.namelist()
+
+
+def input_size(path):
+    '''
+        The size of the data an input holds once decompressed, in bytes. The size of a gzip file is read from
+        its trailer, which holds it modulo 4GB.
+    '''
+    archive, member = split_member(path)
+
+    if member is not None:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.getinfo(member).file_size
+
+    if path.endswith(".gz"):
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return int.from_bytes(f.read(4), "little")
+
+    return os.path.getsize(path)
+
+
+@contextlib.contextmanager
+def open_input(path):
+    '''
+        Opens an input as a binary stream of the data it holds, decompressing it as it is read.
+
+        Raises:
+            FileNotFoundError: If the file, or the file in the archive, doesn't exist.
+    '''
+    archive, member = split_member(path)
+
+    with contextlib.ExitStack() as stack:
+        if member is not None:
+            zf = stack.enter_context(zipfile.ZipFile(archive))
+
+            try:
+                handle = zf.open(member)
+            except KeyError:
+                raise FileNotFoundError(f"No file {member} in the archive {archive}")
+        else:
+            opener = next((opener for suffix, opener in COMPRESSED_SUFFIXES.items() if path.endswith(suffix)), open)
+            handle = opener(path, "rb")
+
+        with handle:
+            yield handle
+
+
+def seekable_source(path):
+    '''
+        The input as something that can be read from anywhere, which workbook readers need: the path of an
+        uncompressed file, else the decompressed data in memory.
+    '''
+    if not is_compressed(path):
+        return path
+
+    with open_input(path) as handle:
+        return io.BytesIO(handle.read())
@@ -1,10 +1,25 @@
-import os, sys
+import os, sys, io, csv, mmap, inspect
 from pprint import pprint
 import pandas as pd
+from pandas.io.parsers import TextParser
 from document_reconciliation import __RECON_SETTINGS_MODULE__
-import multiprocess as mp
 from copy import deepcopy
-from functools import partial
+from functools import partial, lru_cache
+from document_reconciliation.core.exceptions import IngestionMemoryLimitExceeded, UnsupportedReadOptions, InvalidAmounts
+from document_reconciliation.core import executor
+from document_reconciliation.core import cache
+from document_reconciliation.core.documents import engines, compression
+from document_reconciliation.actions import concat, to_minor_units
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
 
 
 
@@ -12,8 +27,339 @@ __SETTINGS_MODULE__ =  __RECON_SETTINGS_MODULE__
 
 __default_section__ = getattr(__SETTINGS_MODULE__, "default_document_section")
 
+# Read options of a sheet that the streaming sheet reader applies itself or passes on to pandas' parser
+# (see read_sheet). Sheets read with any other option are read with pd.read_excel
+SHEET_READ_OPTIONS = ("header", "skiprows", "nrows", "usecols", "dtype", "na_values", "keep_default_na", "parse_dates", "thousands", "decimal", "true_values", "false_values", "converters")
+
+# The size of the byte ranges a memory-mapped file is split into for parsing (see Document._line_ranges)
+RANGE_BYTES = 64 * 1024 ** 2
+
+# Column types of a read schema (e.g. settings.LEDGER_READ_COLS) for numeric columns that should be
+# downcast to the smallest type that holds their values (see pd.to_numeric)
+DOWNCAST_TYPES = ("integer", "signed", "unsigned", "float")
+
+
+def probe_header(path, sep=",", header=0, sheet_name=0):
+    """
+        Returns the column names of a file without reading its data: the header line of a delimited file,
+        or the header row of a sheet of an xlsx workbook, streamed with openpyxl in read-only mode.
+
+        The result is cached per path (and size and mtime), so a file is only probed once. Only the first lines
+        of a compressed file are decompressed.
+
+    """
+    stat = os.stat(compression.source_file(path))
+
+    return list(_probe_header(path, stat.st_size, stat.st_mtime_ns, sep, header if isinstance(header, int) else 0, sheet_name))
+
+
+@lru_cache(maxsize=1024)
+def _probe_header(path, size, mtime, sep, header, sheet_name):
+    if compression.data_name(path).endswith('.csv'):
+        # utf-8-sig drops a byte order mark, as pandas does
+        with compression.open_input(path) as handle:
+            for index, row in enumerate(csv.reader(io.TextIOWrapper(handle, newline='', encoding='utf-8-sig'), delimiter=sep)):
+                if index == header:
+                    return tuple(row)
+
+        return ()
+
+    if openpyxl is None or not compression.data_name(path).endswith(('.xlsx', '.xlsm')):
+        return tuple(str(x) for x in pd.read_excel(compression.seekable_source(path), nrows=0, header=header, sheet_name=sheet_name).columns)
+
+    workbook = openpyxl.load_workbook(compression.seekable_source(path), read_only=True)
+
+    try:
+        sheet = workbook[sheet_name] if isinstance(sheet_name, str) else workbook.worksheets[sheet_name]
+        row = next(sheet.iter_rows(min_row=header + 1, max_row=header + 1, values_only=True), ())
+    finally:
+        workbook.close()
+
+    # Blank header cells are named as pandas names them
+    return tuple(f"Unnamed: {i}" if value is None else str(value) for i, value in enumerate(row))
+
+
+def open_workbook(path):
+    """
+        Opens an xlsx workbook in read-only mode, in which sheets are streamed row by row rather than loaded.
+        Returns None for other formats, or if openpyxl is not installed.
+
+    """
+    if openpyxl is None or not isinstance(path, str) or not compression.data_name(path).endswith(('.xlsx', '.xlsm')):
+        return None
+
+    return openpyxl.load_workbook(compression.seekable_source(path), read_only=True, data_only=True, keep_links=False)
+
+
+def _sheet_rows(sheet):
+    """
+        The rows of a sheet with their cells converted as pandas converts them, without trailing empty cells.
+
+    """
+    for row in sheet.iter_rows():
+        values = []
+
+        for cell in row:
+            if cell.value is None:
+                values.append("")
+            elif cell.data_type == "e":
+                values.append(float("nan"))
+            elif cell.data_type == "n" and isinstance(cell.value, float) and cell.value.is_integer():
+                values.append(int(cell.value))
+            else:
+                values.append(cell.value)
+
+        while values and values[-1] == "":
+            values.pop()
+
+        yield values
+
+
+def read_sheet(workbook, sheet_name, read_options=None, path=None):
+    """
+        Reads a sheet of a workbook opened with open_workbook, streaming its rows rather than loading the sheet
+        into the cells of the workbook. The rows are parsed together, once, so the type of each column is
+        inferred from all of its values, as pd.read_excel infers it.
+
+        Only the options in SHEET_READ_OPTIONS are supported (with an int "header"). The sheet is read with
+        pd.read_excel otherwise, or when there is no workbook (in which case it is read from path).
+
+    """
+    read_options = dict(read_options or {})
+    header = read_options.pop("header", 0)
+
+    if workbook is None:
+        return pd.read_excel(compression.seekable_source(path), sheet_name=sheet_name, header=header, **read_options)
+
+    if not isinstance(header, int) or any(option not in SHEET_READ_OPTIONS for option in read_options):
+        return pd.read_excel(workbook, sheet_name=sheet_name, header=header, **read_options)
+
+    skiprows = read_options.pop("skiprows", None)
+    nrows = read_options.pop("nrows", None)
+
+    skipped = set() if isinstance(skiprows, int) else set(skiprows or [])
+    skip = (lambda index: index < skiprows) if isinstance(skiprows, int) else (lambda index: index in skipped)
+
+    sheet = workbook[sheet_name] if isinstance(sheet_name, str) else workbook.worksheets[sheet_name]
+
+    columns = None
+    rows = []
+    # Empty rows are held back until a row with data follows them, so trailing empty rows are dropped
+    empty_rows = 0
+
+    for index, values in enumerate(r for i, r in enumerate(_sheet_rows(sheet)) if not skip(i)):
+        if index < header:
+            continue
+
+        if columns is None:
+            columns = values
+            continue
+
+        if not values:
+            empty_rows += 1
+            continue
+
+        rows.extend([[]] * empty_rows + [values])
+        empty_rows = 0
+
+        if nrows is not None and len(rows) >= nrows:
+            rows = rows[:nrows]
+
+            while rows and not rows[-1]:
+                rows.pop()
+
+            break
+
+    if columns is None:
+        return pd.DataFrame()
+
+    # Rows are padded to the widest row, as pandas pads them
+    width = max([len(columns)] + [len(row) for row in rows])
+
+    return TextParser([row + [""] * (width - len(row)) for row in [columns] + rows], header=0, skip_blank_lines=False, **read_options).read()
+
+
+def read_sections(path, sections):
+    """
+        Reads the sections (sheets) of a workbook, each with its read mutations applied.
+
+        With "parallel_reads" set in the EXECUTOR settings, each sheet is parsed and mutated by a worker of the
+        shared pool, which streams just that sheet. Otherwise the workbook is opened once and its sheets are read
+        one after the other.
+
+        Returns:
+            dict: A DocumentSection for each section, by name.
+
+    """
+    items = list(sections.items())
+
+    if executor.parallel_reads() and len(items) > 1 and not executor.in_worker():
+        read = executor.get_pool().map(partial(_read_section, path), items, chunksize=1)
+
+        for section in read:
+            section.print_report()
+    else:
+        workbook = open_workbook(path)
+
+        try:
+            read = [_read_section(path, item, workbook) for item in items]
+        finally:
+            if workbook is not None:
+                workbook.close()
+
+    return dict(zip([name for name, section in items], read))
+
+
+def _read_section(path, item, workbook=None):
+    section_name, section = item
+
+    # In a worker, the workbook is opened there and only this sheet is streamed
+    opened = open_workbook(path) if workbook is None else None
+
+    try:
+        return DocumentSection(dict({section_name: dict(section, path=path)}), workbook or opened)
+    finally:
+        if opened is not None:
+            opened.close()
+
+
+def read_documents(doc_dicts, sizes=None, on_read=None):
+    """
+        Reads several independent documents (e.g. the files of the input folders) concurrently on the shared pool.
+
+        Files are handed to the workers largest first, so that a large file doesn't start last and hold up the
+        rest. The documents are returned in the order of doc_dicts.
+
+        Args:
+            doc_dicts (list): The doc_dict of each document, as passed to Document.
+            sizes (dict): Optional. File sizes in bytes by path (e.g. from a directory scan). Files without one are stat'ed.
+            on_read: Optional. A mutation applied to each document by the worker that read it.
+
+    """
+    doc_dicts = list(doc_dicts)
+    sizes = sizes or {}
+
+    def size(doc_dict):
+        path = list(doc_dict.values())[0].get("path")
+
+        if path not in sizes:
+            # The size of the data once decompressed, which is what the time to read a file goes with
+            sizes[path] = compression.input_size(path) if compression.exists(path) else 0
+
+        return sizes[path]
+
+    if not (executor.parallel_reads() and len(doc_dicts) > 1) or executor.in_worker():
+        return [_read_document(doc_dict, on_read) for doc_dict in doc_dicts]
+
+    order = sorted(range(len(doc_dicts)), key=lambda i: size(doc_dicts[i]), reverse=True)
+
+    # One file per task, so each worker takes the next largest file as soon as it is free
+    docs = executor.get_pool().map(partial(_read_document, on_read=on_read), [doc_dicts[i] for i in order], chunksize=1)
+
+    result = [None] * len(doc_dicts)
+    for i, doc in zip(order, docs):
+        result[i] = doc
+
+    # What the workers had to say about each document, one document after the other
+    for doc in result:
+        doc.print_report()
+
+    return result
+
+
+def _read_document(doc_dict, on_read=None):
+    doc = Document(doc_dict)
+
+    if on_read:
+        doc._set_dataframe(doc._bind_mutation(on_read)(doc.dataframe))
+
+    return doc
+
+
+class MappedRange(io.RawIOBase):
+    """
+        A byte range of a memory-mapped file as a read-only stream, read straight from the mapping.
+
+    """
 
-num_cores = 4  # Get the number of CPU cores
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+
+    def readable(self):
+        return True
+
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self._view) - self._position)
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+
+        return size
+
+
+def compact(df, amounts=None, downcast=None):
+    """
+        Converts the amount columns of df to integer minor units ({column: scale}, see Document.amounts) and
+        downcasts the numeric columns in downcast ({column: one of DOWNCAST_TYPES}). Column names are lowercase.
+
+        Raises:
+            InvalidAmounts: If a value of an amount column is not a number.
+
+    """
+    amounts = amounts or {}
+    downcast = downcast or {}
+
+    for col in df.columns:
+        if col.lower() in amounts:
+            # Amounts that aren't numbers would otherwise be dropped from the totals and the matching
+            numbers = pd.to_numeric(df[col], errors="coerce")
+            invalid = numbers.isna() & df[col].notna()
+
+            if invalid.any():
+                raise InvalidAmounts(col, list(df[col][invalid].unique()[:5]), invalid.sum())
+
+            df[col] = to_minor_units(numbers, amounts[col.lower()])
+        elif col.lower() in downcast:
+            df[col] = pd.to_numeric(df[col], downcast=downcast[col.lower()])
+
+    return df
+
+
+def _accepts(func, name):
+    """
+        Whether func takes the keyword argument name, as a parameter of its own or through **kwargs.
+
+    """
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+
+    return any(parameter.name == name or parameter.kind == parameter.VAR_KEYWORD for parameter in parameters)
+
+
+def _read_range(path, byte_range, read_options, actions=()):
+    """
+        Parses the lines in a byte range of a delimited file, mapping the file rather than reading it, and applies
+        the actions to the result. This is what runs inside a worker for a memory-mapped read.
+
+        Returns:
+            tuple: (the dataframe, the number of rows parsed).
+
+    """
+    start, end = byte_range
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        # The views must be released before the mapping is closed
+        with memoryview(mapping) as view, view[start:end] as lines:
+            try:
+                df = pd.read_csv(MappedRange(lines), **read_options)
+            except pd.errors.EmptyDataError:
+                df = pd.DataFrame(columns=read_options.get("usecols", None) or read_options["names"])
+
+    return executor.run_sequence(df, actions), len(df)
 
 
 class Document:
@@ -34,6 +380,11 @@ class Document:
         self._sections = {}
         self._has_sections = False
         self._dataframe = pd.DataFrame()
+        self._read_stats = {}
+        self._downcast = {}
+        self._content_hash = None
+        self._hash_content = False
+        self._messages = []
 
         self._initialize(doc_dict)
 
@@ -50,6 +401,16 @@ class Document:
         return self._path
 
 
+    @property
+    def content_hash(self):
+        """
+            The hash of the content of the file, if it was known or hashed when the file was read (see
+            core.cache.manifest), else None.
+
+        """
+        return self._content_hash
+
+
     @property
     def config(self):
         return self._config
@@ -75,6 +436,27 @@ class Document:
         return self._dataframe
 
 
+    @property
+    def amounts(self):
+        """
+            The amount columns of the document (the "amount_cols" of its "ingest" config) mapped to the number
+            of minor units they are held in per unit of currency, if the AMOUNTS settings hold amounts in
+            minor units. Empty otherwise.
+
+        """
+        amounts = getattr(__SETTINGS_MODULE__, "AMOUNTS", {})
+
+        if not amounts.get("minor_units", False):
+            return {}
+
+        return {col.lower(): amounts.get("scale", 100) for col in (self.config or {}).get("ingest", {}).get("amount_cols", [])}
+
+
+    @property
+    def read_stats(self):
+        return self._read_stats
+
+
     '''
         Setters
     '''
@@ -116,6 +498,10 @@ class Document:
         self._dataframe = df
 
 
+    def _set_read_stats(self, **stats):
+        self._read_stats = stats
+
+
     def _set_mutations(self, value):
         """
         Sets the mutations of the Document based on the 'mutations' value in doc_dict.
@@ -132,13 +518,8 @@ class Document:
 
         """
         if self.has_sections:
-            for section_name in self.sections:
-
-                section = self.sections.get(section_name)
-
-                section["path"] = self.dataframe
-
-                self._sections[section_name] = DocumentSection(dict({section_name: section}))
+            # Every section is a sheet of the workbook
+            self._sections.update(read_sections(self.path, self.sections))
         else:
             # No specific sections defined, use default section with main configuration
             self._sections[__default_section__] = self
@@ -164,6 +545,10 @@ class Document:
         self._set_name(document_name)
         self._set_config(doc_dict.get("config"))
         self._set_path(doc_dict.get("path"))
+        # The hash of the content of the file, when it is already known (see core.cache.manifest)
+        self._content_hash = doc_dict.get("content_hash", None)
+        # Otherwise whether to hash it before reading it, to address it in the cache by its content
+        self._hash_content = doc_dict.get("hash_content", False)
 
         self._set_has_sections(doc_dict.get("sections", False))
         
@@ -179,6 +564,10 @@ class Document:
             Fix the pandas read options to work right.
 
             1. Modify usecols option and also set the dtype.
+
+            Besides Python types, the types in the usecols schema can be any dtype pandas reads directly
+            (e.g. "category" for low cardinality columns, "string[pyarrow]" for Arrow backed strings), or
+            one of DOWNCAST_TYPES for numeric columns.
         '''
 
         pandas_config = deepcopy(self.config.get("pandas", {}))
@@ -191,19 +580,26 @@ class Document:
             use_columns = pandas_config["read"]["usecols"]
             # Convert the column names to lowercase for consistency
             columns = [x.lower() for x in use_columns.keys()]
-            # Read the first row of the CSV or Excel file to get column names and types
-            # Use pd.read_csv if the file is a CSV, else use pd.read_excel
-            columns_df = pd.read_csv(self.path, nrows=0, sep=delimiter) if self.path.endswith('.csv') else pd.read_excel(self.path, nrows=0, sep=delimiter)
-            # Filter the found columns based on the columns present in the DataFrame
+            # Probe the header of the CSV or Excel file to get the column names, without reading the data
+            header_columns = probe_header(self.path, sep=delimiter, header=pandas_config["read"].get("header", 0), sheet_name=pandas_config["read"].get("sheet_name", 0))
+            # Filter the found columns based on the columns present in the file
             # and match them against the lowercase version of the specified columns
-            found_columns = [x for x in filter(lambda x: x.lower() in columns, columns_df.columns.tolist())]
+            found_columns = [x for x in filter(lambda x: x.lower() in columns, header_columns)]
             # Add the dtype pandas option and initialize it to an empty dictionary to specify column types
             pandas_config["read"]["dtype"] = {}
             # Update the dtype dictionary with the specified types for the found columns
             # The use_columns dictionary maps column names to their specified types
             # Only include the columns that were found in the file
             for x in found_columns:
-                pandas_config["read"]["dtype"][x] = use_columns[x.lower()]
+                column_type = use_columns[x.lower()]
+                # Columns to be downcast are read with the type pandas infers and downcast after each chunk is read
+                if column_type in DOWNCAST_TYPES:
+                    self._downcast[x.lower()] = column_type
+                # Arrow backed strings need pyarrow, fall back to Python strings without it
+                elif column_type == "string[pyarrow]" and pyarrow is None:
+                    pandas_config["read"]["dtype"][x] = str
+                else:
+                    pandas_config["read"]["dtype"][x] = column_type
             # Update the configuration with the found column names
             # Assign the lowercase column names to the "usecols" keys, this ensures that subsequent processing uses the consistent lowercase column names
             pandas_config["read"]["usecols"] = found_columns
@@ -214,33 +610,396 @@ class Document:
     def _read_file(self):
         """
             Reads the file specified in the path using pandas read_csv or read_excel based on the file extension.
+            Compressed files and files in archives (see core.documents.compression) are decompressed as they are read.
 
         """
         
+        # Documents read and mutated before with the same file content, options and mutations are loaded from the cache
+        cache_key = self._cache_key()
+
+        if cache_key and self._load_cached(cache_key):
+            return
+
         pandas_config = self._set_pandas_options()
 
         if self.has_sections:
-
-            dataframe = pd.ExcelFile(self.path, **pandas_config["read"])
-            self._set_dataframe(dataframe)
+            # The sheets are read by the sections themselves (see read_sections)
+            pass
 
         else:
             
+            mutations = self.mutations
+
             try:
-                if self.path.endswith('.csv'):
-                    # If chunksize is defined, read in chunks
+                # A reader engine configured for the input reads the file
+                dataframe = self._read_with_engine(pandas_config["read"])
+                # Otherwise a memory-mapped file is parsed in line-aligned byte ranges
+                ranges = self._line_ranges(pandas_config["read"]) if dataframe is None else None
+
+                if dataframe is not None:
+                    # Row filters and column renames were applied as the engine read the file
+                    pushdown, mutations = self._split_pushdown_mutations()
+                    self._set_dataframe(dataframe)
+                elif ranges is not None:
+                    # Row filters and column renames are applied to each range by the worker that parses it
+                    pushdown, mutations = self._split_pushdown_mutations()
+                    self._set_dataframe(self._read_ranges(pandas_config["read"], ranges, pushdown))
+                elif compression.data_name(self.path).endswith('.csv'):
+                    # If chunksize is defined, stream the file in chunks
                     if 'chunksize' in pandas_config["read"].keys():
-                        for df in pd.read_csv(self.path, **pandas_config["read"]):
-                            self._set_dataframe(pd.concat([self.dataframe, df]))
+                        # Row filters and column renames are applied to each chunk as it is read
+                        pushdown, mutations = self._split_pushdown_mutations()
+                        self._set_dataframe(self._stream_csv(pandas_config["read"], pushdown))
                     else:
-                        self._set_dataframe(pd.read_csv(self.path, **pandas_config["read"]))
+                        with compression.open_input(self.path) as handle:
+                            self._set_dataframe(self._compact(pd.read_csv(handle, **pandas_config["read"])))
+                        self._set_read_stats(rows=len(self.dataframe), chunks=1, bytes_read=compression.input_size(self.path), memory_by_column=self._column_memory(self.dataframe))
                 else:
-                    self._set_dataframe(pd.read_excel(self.path, **pandas_config["read"]))
+                    self._set_dataframe(self._compact(pd.read_excel(compression.seekable_source(self.path), **pandas_config["read"])))
+                    self._set_read_stats(rows=len(self.dataframe), chunks=1, bytes_read=compression.input_size(self.path), memory_by_column=self._column_memory(self.dataframe))
+
+                self._report(f"{self.name}: read {self.read_stats['rows']} rows, kept {len(self.dataframe)} ({self.read_stats['bytes_read']} bytes) from {self.path}")
+
+                self._print_memory_report()
 
-                self._apply_mutations()
+                self._apply_mutations(mutations)
+
+                if cache_key:
+                    cache.store(cache_key, self.dataframe)
 
             except FileNotFoundError as e:
-                print(f"File not found: {self.path}")
+                self._report(f"File not found: {self.path}")
+
+
+    def _read_with_engine(self, read_options):
+        """
+            Reads the file with the reader engine set as the "engine" of the "ingest" config of the document
+            (see core.documents.engines), with its types compacted and the row filters and column renames of
+            its read mutations applied. A streaming engine is read chunk by chunk, as the pandas reader is (see
+            _stream_csv).
+
+            Returns:
+                pd.DataFrame: The file as read, or None if no engine is set, the engine isn't installed or it doesn't
+                support the read options, in which case the file is to be read the default way.
+
+        """
+        engine = self.config.get("ingest", {}).get("engine", None)
+        reader = engines.get_engine(engine, self.path) if engine else None
+
+        if reader is None:
+            return None
+
+        pushdown = self._split_pushdown_mutations()[0]
+
+        try:
+            if reader.streaming:
+                return self._stream_csv(read_options, pushdown, reader)
+
+            dataframe = reader(self.path, read_options)
+            rows = len(dataframe)
+
+            dataframe = self._compact(dataframe)
+            for action in [self._bind_mutation(mutation) for mutation in pushdown]:
+                dataframe = action(dataframe)
+
+            self._set_read_stats(rows=rows, chunks=1, bytes_read=compression.input_size(self.path), memory_by_column=self._column_memory(dataframe))
+
+            return dataframe
+        except UnsupportedReadOptions as e:
+            self._report(f"{self.name}: {e.message}, reading with pandas instead.")
+            return None
+
+
+    def _cache_key(self, ):
+        """
+            The address of the document in the cache (see core.cache), or None if it isn't cached.
+            Documents with sections are not cached.
+
+        """
+        if self.has_sections or not cache.enabled() or not compression.exists(self.path):
+            return None
+
+        # Hashed by whoever reads the document, a worker of the pool for the files of a folder
+        if self._content_hash is None and self._hash_content:
+            self._content_hash = cache.file_hash(self.path)
+
+        return cache.key(
+            self.path,
+            self.name,
+            self.config.get("pandas", {}).get("read", {}),
+            self.config.get("ingest", {}),
+            getattr(__SETTINGS_MODULE__, "AMOUNTS", {}),
+            self.mutations,
+            # The code that reads the file and converts its columns
+            [Document, concat, engines, compression],
+            content_hash=self._content_hash,
+        )
+
+
+    def _load_cached(self, cache_key):
+        """
+            Sets the dataframe to the cached one for cache_key, if there is one.
+
+            Returns:
+                bool: Whether the document was loaded from the cache.
+
+        """
+        df = cache.load(cache_key)
+
+        if df is None:
+            return False
+
+        self._set_dataframe(df)
+        self._set_read_stats(rows=len(df), chunks=0, bytes_read=0, cached=True)
+
+        self._report(f"{self.name}: loaded {len(df)} rows from the cache for {self.path}")
+
+        return True
+
+
+    def _line_ranges(self, read_options):
+        """
+            If "mmap" is set in the "ingest" config of the document, memory-maps the file and splits its data into
+            byte ranges of about "range_bytes" (RANGE_BYTES by default), each ending at the end of a line. Only the
+            few bytes around each boundary are read to find the line ends.
+
+            Lines are split on line breaks alone, so the file must not have line breaks within quoted values.
+
+            Returns:
+                list: The (start, end) byte offsets of the ranges, or None if the file is to be read as a stream: it
+                isn't an uncompressed delimited file, mmap isn't set, or the read options don't allow splitting it
+                (a header other than the first line, or rows skipped other than those directly after it).
+
+        """
+        ingest = self.config.get("ingest", {})
+
+        if not ingest.get("mmap", False) or compression.is_compressed(self.path) or not self.path.endswith('.csv'):
+            return None
+
+        skiprows = read_options.get("skiprows", None) or []
+
+        if read_options.get("header", 0) != 0 or isinstance(skiprows, int) or sorted(skiprows) != list(range(1, len(skiprows) + 1)):
+            self._report(f"{self.name}: the read options don't allow the file to be split into ranges, reading it as a stream instead.")
+            return None
+
+        size = os.path.getsize(self.path)
+        range_bytes = ingest.get("range_bytes", None) or RANGE_BYTES
+
+        if size == 0:
+            return None
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            # The data starts after the header line and the rows skipped after it
+            start = 0
+            for _ in range(1 + len(skiprows)):
+                start = mapping.find(b"\n", start) + 1 or size
+
+            ranges = []
+
+            while start < size:
+                end = mapping.find(b"\n", min(start + range_bytes, size) - 1) + 1 or size
+                ranges.append((start, end))
+                start = end
+
+        return ranges
+
+
+    def _read_ranges(self, read_options, ranges, pushdown=None):
+        """
+            Parses the byte ranges of a memory-mapped file (see _line_ranges) on the shared pool, each worker mapping
+            the file and parsing its range in place, so this process never reads or copies the data. Mutations in
+            "pushdown" are applied to each range by the worker that parsed it.
+
+            The ranges are concatenated in order, with the index a sequential read would have given them.
+
+            Returns:
+                pd.DataFrame: The complete dataframe.
+
+            Raises:
+                IngestionMemoryLimitExceeded: If the parsed ranges exceed the "memory_limit" of the "ingest" config.
+
+        """
+        memory_limit = self.config.get("ingest", {}).get("memory_limit", None)
+
+        # Every range is parsed without a header, with the names in the header line
+        range_options = {option: value for option, value in read_options.items() if option not in ("header", "skiprows", "chunksize")}
+        range_options.update(header=None, names=probe_header(self.path, sep=read_options.get("sep", ",")))
+
+        # The types are compacted by the workers, without sending them the document
+        actions = [partial(compact, amounts=self.amounts, downcast=self._downcast)] + [self._bind_mutation(mutation) for mutation in pushdown or []]
+
+        read = partial(_read_range, self.path, read_options=range_options, actions=actions)
+
+        if executor.parallel_reads() and len(ranges) > 1 and not executor.in_worker():
+            results = executor.get_pool().imap(read, ranges)
+        else:
+            results = map(read, ranges)
+
+        chunks = []
+        rows = 0
+        memory_used = 0
+        memory_by_column = {}
+
+        for (start, end), (chunk, chunk_rows) in zip(ranges, results):
+            chunk.index = chunk.index + rows
+            rows += chunk_rows
+
+            chunks.append(chunk)
+            self._add_column_memory(memory_by_column, chunk)
+
+            if memory_limit:
+                memory_used += chunk.memory_usage(deep=True).sum()
+                if memory_used > memory_limit:
+                    raise IngestionMemoryLimitExceeded(self.name, memory_limit, rows, end)
+
+        self._set_read_stats(rows=rows, rows_kept=sum(len(chunk) for chunk in chunks), chunks=len(chunks), bytes_read=ranges[-1][1] if ranges else 0, memory_used=memory_used or None, memory_by_column=memory_by_column or None)
+
+        if not chunks:
+            return pd.DataFrame(columns=read_options.get("usecols", None))
+
+        return concat(chunks, copy=False)
+
+
+    def _stream_csv(self, read_options, pushdown=None, reader=None):
+        """
+            Streams a delimited file in chunks, read with pd.read_csv or with the streaming engine "reader" (see
+            core.documents.engines), and materializes it with a single concat.
+
+            Chunks are accumulated in a list rather than being concatenated onto the dataframe
+            one at a time, which would copy the growing frame once per chunk.
+
+            Mutations in "pushdown" are applied to each chunk as soon as it is read, so rows they
+            discard are never accumulated.
+
+            If "memory_limit" (in bytes) is set in the "ingest" config of the document, reading
+            stops as soon as the accumulated chunks exceed it.
+
+            Returns:
+                pd.DataFrame: The complete dataframe.
+
+            Raises:
+                IngestionMemoryLimitExceeded: If the accumulated chunks exceed the memory limit.
+
+        """
+        memory_limit = self.config.get("ingest", {}).get("memory_limit", None)
+
+        actions = [self._bind_mutation(mutation) for mutation in pushdown or []]
+
+        chunks = []
+        rows = 0
+        rows_kept = 0
+        memory_used = 0
+        memory_by_column = {}
+
+        # Compressed files are decompressed as the chunks are read, never unpacked whole
+        with compression.open_input(self.path) as handle:
+            for chunk in reader(handle, read_options) if reader is not None else pd.read_csv(handle, **read_options):
+                rows += len(chunk)
+
+                chunk = self._compact(chunk)
+
+                for action in actions:
+                    chunk = action(chunk)
+
+                chunks.append(chunk)
+                rows_kept += len(chunk)
+
+                self._add_column_memory(memory_by_column, chunk)
+
+                if memory_limit:
+                    memory_used += chunk.memory_usage(deep=True).sum()
+                    if memory_used > memory_limit:
+                        raise IngestionMemoryLimitExceeded(self.name, memory_limit, rows, handle.tell())
+
+            bytes_read = handle.tell()
+
+        self._set_read_stats(rows=rows, rows_kept=rows_kept, chunks=len(chunks), bytes_read=bytes_read, memory_used=memory_used or None, memory_by_column=memory_by_column or None)
+
+        if not chunks:
+            return pd.DataFrame(columns=read_options.get("usecols", None))
+
+        return concat(chunks, copy=False)
+
+
+    def _compact(self, df):
+        """
+            Downcasts the numeric columns whose type in the read schema is one of DOWNCAST_TYPES, and
+            converts the amount columns to integer minor units (see Document.amounts).
+
+        """
+        return compact(df, self.amounts, self._downcast)
+
+
+    def _column_memory(self, df):
+        """
+            If "report_memory" is set in the "ingest" config of the document, returns the memory used by each column
+            of df as (bytes as Python objects / float64, bytes as read), i.e. before and after compact types.
+
+        """
+        if not self.config.get("ingest", {}).get("report_memory", False):
+            return None
+
+        memory = {}
+
+        for col in df.columns:
+            after = df[col].memory_usage(index=False, deep=True)
+
+            if pd.api.types.is_numeric_dtype(df[col].dtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                before = len(df) * 8
+            else:
+                before = df[col].astype(object).memory_usage(index=False, deep=True)
+
+            memory[col] = (before, after)
+
+        return memory
+
+
+    def _report(self, message):
+        """
+            Prints a message about reading the document. In a worker of the pool the message is kept instead, to be
+            printed by the parent (see print_report), as the output of several workers would interleave.
+
+        """
+        if executor.in_worker():
+            self._messages.append(message)
+        else:
+            print(message)
+
+
+    def print_report(self, ):
+        """
+            Prints the messages kept while the document was read in a worker.
+
+        """
+        for message in self._messages:
+            print(message)
+
+        self._messages = []
+
+
+    def _add_column_memory(self, memory_by_column, chunk):
+        """
+            Adds the memory used by each column of a chunk (see _column_memory) to the totals in memory_by_column.
+
+        """
+        for col, (before, after) in (self._column_memory(chunk) or {}).items():
+            total_before, total_after = memory_by_column.get(col, (0, 0))
+            memory_by_column[col] = (total_before + before, total_after + after)
+
+
+    def _print_memory_report(self, ):
+        memory_by_column = self.read_stats.get("memory_by_column", None)
+
+        if not memory_by_column:
+            return
+
+        self._report(f"{self.name}: memory by column, before -> after compact types (bytes)")
+        for col, (before, after) in memory_by_column.items():
+            self._report(f"    {col}: {before} -> {after} ({self.dataframe[col].dtype if col in self.dataframe else ''})")
+
+        before = sum(before for before, after in memory_by_column.values())
+        after = sum(after for before, after in memory_by_column.values())
+        self._report(f"    total: {before} -> {after}")
 
 
     def _append_document(self, df_iter, **kwargs):
@@ -259,13 +1018,14 @@ class Document:
 
         """
 
-
-        pool = mp.Pool(num_cores)
-
         on_before_join = kwargs.get("on_before_join", None)
         on_join = kwargs.get("on_join", None)
         on_complete_join = kwargs.get("on_complete_join", None)
 
+        # Frames waiting to be concatenated onto the dataframe, all at once unless an on_join hook needs
+        # to see the dataframe after each of them
+        frames = [self.dataframe]
+
         for item in df_iter:
 
             name = item.name or "default"
@@ -278,82 +1038,195 @@ class Document:
                 raise ValueError("Invalid item type. Must be a Document instance or DataFrame.")
 
 
-            df_len = len(df)
-
-            if df_len > 0:
-                chunk_size = df_len // num_cores  # Determine the chunk size
-                chunks = [df[i:i + chunk_size] for i in range(0, chunk_size)]
+            if len(df) > 0:
+                chunks = self._split(df) if on_before_join or on_join else []
 
                 if on_before_join:
                     # Apply the helper function to each chunk using map()
-                    result = pool.map(on_before_join, chunks)
-                    df = pd.concat(result)
+                    result = executor.map_frames(on_before_join, chunks)
+                    df = concat(result)
 
-                self._set_dataframe(pd.concat([self.dataframe, df], ignore_index=True))
+                frames.append(df)
 
                 if on_join:
-                    result = pool.map(on_join, chunks)
-                    self._set_dataframe(pd.concat(result))
+                    self._set_dataframe(concat(frames, ignore_index=True))
+
+                    result = executor.map_frames(on_join, chunks)
+                    self._set_dataframe(concat(result))
+
+                    frames = [self.dataframe]
+
+        if len(frames) > 1:
+            self._set_dataframe(concat(frames, ignore_index=True))
 
         if on_complete_join:
-            df_len = len(df)
-            if df_len > 0:
-                chunk_size = df_len // num_cores  # Determine the chunk size
-                chunks = [df[i:i + chunk_size] for i in range(0, chunk_size)]
-                result = pool.map(on_complete_join, chunks)
+            if len(df) > 0:
+                chunks = self._split(df)
+                result = executor.map_frames(on_complete_join, chunks)
 
-                self._set_dataframe(pd.concat(result))
+                self._set_dataframe(concat(result))
 
         return self
 
 
-    def _apply_mutations(self, ):
+    def _split(self, df):
         """
-            Applies mutations to the dataframe based on the specified mutation type.
-            Always adds the name of the document being worked on to params kwargs.
+            Splits a dataframe into one chunk per worker of the shared pool.
+
+        """
+        chunk_size = -(-len(df) // executor.pool_size())  # Determine the chunk size, rounded up
+
+        return [df[i:i+chunk_size].copy() for i in range(0, df.shape[0], chunk_size)]
+
+
+    def _bind_mutation(self, mutation):
+        """
+            Returns the callable for a mutation with its params (and the name and the amount columns
+            of the document being worked on) bound as kwargs.
 
         """
         # Dictionary Document Name
         doc_name = {"report_name": self.name}
+        action = mutation["action"] if isinstance(mutation, dict) else mutation
 
-        df_len = len(self.dataframe)
-        
-        if df_len > 0:
-            chunk_size = df_len // num_cores  # Determine the chunk size
+        # The amount columns only go to mutations that take them
+        if _accepts(action, "amounts"):
+            doc_name["amounts"] = self.amounts
 
-            pool = mp.Pool(num_cores)
+        if isinstance(mutation, dict):
+            try:
+                mutation["params"].update(doc_name)
+            except KeyError:
+                mutation["params"] = doc_name
 
-            for mutation in self.mutations:
+            return partial(mutation["action"], **mutation["params"])
 
-                chunks = [self.dataframe[i:i+chunk_size].copy() for i in range(0,self.dataframe.shape[0],chunk_size)]
+        #If the mutation is a lambda method, we can't pass kwargs.
+        return partial(mutation, **doc_name) if not mutation.__name__ == '<lambda>' else mutation
 
-                if isinstance(mutation, dict):
-                    try:
-                        mutation["params"].update(doc_name)
-                    except KeyError:
-                        mutation["params"] = doc_name
 
-                    action = partial(mutation["action"], **mutation["params"])
+    def _unpack_mutation(self, mutation):
+        """
+            Returns the action and the params of a mutation, which is either a dict or a plain callable.
 
-                    df = pool.map(action, chunks)
-                    self._set_dataframe(pd.concat(df))
+        """
+        if isinstance(mutation, dict):
+            return mutation["action"], mutation.get("params", {})
+
+        return mutation, {}
 
-                else:
-                    #If the mutation is a lambda method, we can't pass kwargs.
-                    action = partial(mutation, **doc_name) if not mutation.__name__ == '<lambda>' else mutation
-                    df = pool.map(action, chunks)
 
-                    self._set_dataframe(pd.concat(df))
+    def _is_barrier(self, mutation):
+        """
+            Whether a mutation needs to see the complete dataframe (e.g. sorting or removing duplicates),
+            either because its action is marked with mutate.barrier or the mutation sets "barrier".
+
+        """
+        action, params = self._unpack_mutation(mutation)
+
+        if isinstance(mutation, dict) and "barrier" in mutation:
+            return bool(mutation["barrier"])
+
+        return getattr(action, "barrier", False)
+
+
+    def _split_pushdown_mutations(self, ):
+        """
+            Splits the mutations of the Document into those that can be pushed down into the chunked
+            reader and those that must run on the complete dataframe.
+
+            Only the leading run of mutations marked with mutate.pushdown is pushed down, so the order
+            in which the mutations are applied is preserved.
+
+            Returns:
+                tuple: (pushdown mutations, remaining mutations)
+
+        """
+        mutations = list(self.mutations or [])
+
+        for index, mutation in enumerate(mutations):
+            action, params = self._unpack_mutation(mutation)
+
+            condition = getattr(action, "pushdown", None)
+
+            if not (condition and condition(**params)):
+                return mutations[:index], mutations[index:]
+
+        return mutations, []
+
+
+    def _apply_mutations(self, mutations=None):
+        """
+            Applies mutations to the dataframe based on the specified mutation type.
+            Always adds the name of the document being worked on to params kwargs.
+
+            If "fuse_mutations" is set in the EXECUTOR settings, consecutive mutations are fused: each
+            chunk is sent to the pool once, every mutation runs on it inside the worker, and the results
+            are concatenated once. Barrier mutations run on the complete dataframe in between.
+
+            Args:
+                mutations (list): Optional. The mutations to apply, defaults to the mutations of the Document.
+
+        """
+        if mutations is None:
+            mutations = self.mutations
+
+        if len(self.dataframe) == 0:
+            return
+
+        fuse = executor.fuse_mutations()
+
+        # Mutations waiting to be sent to the pool together
+        pending = []
+
+        for mutation in mutations:
+
+            if self._is_barrier(mutation):
+                self._run_in_pool(pending)
+                pending = []
+
+                self._set_dataframe(self._bind_mutation(mutation)(self.dataframe))
+                continue
+
+            pending.append(self._bind_mutation(mutation))
+
+            if not fuse:
+                self._run_in_pool(pending)
+                pending = []
+
+        self._run_in_pool(pending)
+
+
+    def _run_in_pool(self, actions):
+        """
+            Splits the dataframe into chunks, sends each chunk to the pool once to have all the actions
+            applied to it in order, and concatenates the results.
+
+        """
+        if actions and len(self.dataframe) > 0:
+            # A document read inside a worker (see read_documents) is mutated in place
+            if executor.in_worker():
+                self._set_dataframe(executor.run_sequence(self.dataframe, actions))
+                return
+
+            chunks = self._split(self.dataframe)
+
+            df = executor.map_frames(partial(executor.run_sequence, actions=actions), chunks)
+            self._set_dataframe(concat(df))
 
 
 
 
 class DocumentSection(Document):
 
-    def __init__(self, doc_dict):
+    def __init__(self, doc_dict, workbook=None):
         self._doc_dict = doc_dict
+        self._workbook = workbook
         self._name = None
         self._config = None
+        self._read_stats = {}
+        self._downcast = {}
+        self._messages = []
         self._set_dataframe(pd.DataFrame())
 
         self._initialize()
@@ -372,9 +1245,19 @@ class DocumentSection(Document):
 
 
     def _read_file(self):
-        dataframe = pd.read_excel(self.path, sheet_name = self.name, **self.config["pandas"]["read"])
+        mutations = self.mutations
+        dataframe = self._read_with_engine(dict(self.config["pandas"]["read"], sheet_name=self.name))
+
+        if dataframe is None:
+            dataframe = read_sheet(self._workbook, self.name, self.config["pandas"]["read"], path=self.path)
+        else:
+            # Row filters and column renames were applied as the engine read the sheet
+            pushdown, mutations = self._split_pushdown_mutations()
         self._set_dataframe(dataframe)
-        self._apply_mutations()
+        self._apply_mutations(mutations)
+
+        # The workbook is closed by whoever opened it, and can't be pickled
+        self._workbook = None
 
         
 
@@ -0,0 +1,224 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from document_reconciliation.core.exceptions import UnsupportedReadOptions
+from document_reconciliation.core.documents import compression
+
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+except ImportError:
+    pyarrow = None
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+
+'''
+    Reader engines a Document can read its file with, selected per input with the "engine" of its "ingest" config.
+
+    An engine takes the pandas read options of the input (as resolved by Document._set_pandas_options). It raises
+    UnsupportedReadOptions for options it can't honour, in which case the file is read the default way
+    (pd.read_csv / pd.read_excel), as it is when the engine isn't installed.
+
+    A streaming engine (registered with streaming=True) takes the input as a binary stream and yields it in chunks,
+    which Document reads like the chunks of the pandas reader (see Document._stream_csv), so the memory limit and
+    the row filters apply to them. The other engines take the path of the input and return it whole.
+'''
+
+
+# Engine name: (file extensions, whether its library is installed, reader)
+ENGINES = {}
+
+# The size of the blocks the pyarrow reader parses and yields a file in
+BLOCK_BYTES = 4 * 1024 ** 2
+
+# The strings pandas reads as missing values by default
+NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null"]
+
+
+def register(name, extensions, available=True, streaming=False):
+    '''
+        Registers a reader function as the engine "name" for files with the given extensions.
+    '''
+    def decorator(func):
+        func.streaming = streaming
+        ENGINES[name] = (tuple(extensions), available, func)
+        return func
+
+    return decorator
+
+
+def get_engine(name, path):
+    '''
+        Returns the reader of engine "name" if it is installed and reads files like path (or like the file a
+        compressed path holds), else None.
+    '''
+    if name not in ENGINES:
+        return None
+
+    extensions, available, reader = ENGINES[name]
+
+    return reader if available and compression.data_name(path).endswith(extensions) else None
+
+
+def _check_options(read_options, supported):
+    unsupported = [option for option in read_options if option not in supported]
+
+    if unsupported:
+        raise UnsupportedReadOptions(unsupported)
+
+
+def _is_float(col_type):
+    try:
+        return pd.api.types.is_float_dtype(pd.api.types.pandas_dtype(col_type))
+    except TypeError:
+        return False
+
+
+def _to_pandas(table, dtype, start=0):
+    '''
+        Converts a pyarrow table to a dataframe with the types of "dtype" as pd.read_csv gives them, indexed from start.
+    '''
+    # Columns are converted one at a time, so Arrow backed strings and categories never go through Python objects
+    columns = {}
+
+    for col in table.column_names:
+        col_type = dtype.get(col, None)
+        column = table.column(col)
+
+        if col_type == "string[pyarrow]":
+            columns[col] = pd.arrays.ArrowStringArray(column)
+        elif col_type == "category":
+            # Sorted categories, as pd.read_csv gives them
+            categorical = column.dictionary_encode().to_pandas()
+            columns[col] = categorical.cat.reorder_categories(sorted(categorical.cat.categories))
+        elif col_type in (str, "str", object, "object"):
+            # Missing strings are NaN, as with pd.read_csv
+            values = column.to_pandas()
+            columns[col] = values.where(values.notna(), np.nan)
+        elif col_type is not None:
+            columns[col] = column.to_pandas().astype(col_type)
+        else:
+            columns[col] = column.to_pandas()
+
+    df = pd.DataFrame(columns)
+    # Set after the columns are in place, the converted columns are indexed from 0
+    df.index = pd.RangeIndex(start, start + table.num_rows)
+
+    return df
+
+
+@register("pyarrow", [".csv"], available=pyarrow is not None, streaming=True)
+def read_csv_pyarrow(handle, read_options):
+    '''
+        Parses a delimited file from a binary stream with pyarrow's CSV reader, which converts the columns of each
+        block of the file on several threads, and yields it a block at a time.
+
+        Columns are converted to the types of the "dtype" option the way pd.read_csv converts them, and the chunks
+        are indexed as pd.read_csv indexes them. "chunksize" is ignored: the chunks are the blocks of the reader.
+        Rows in "skiprows" must directly follow the header.
+
+        The types of columns without a declared type are inferred from the first block. A later block that doesn't
+        fit them raises UnsupportedReadOptions for "dtype".
+    '''
+    _check_options(read_options, ("sep", "header", "usecols", "dtype", "skiprows", "chunksize"))
+
+    header = read_options.get("header", 0)
+    skiprows = read_options.get("skiprows", None) or []
+
+    if header != 0 or isinstance(skiprows, int) or sorted(skiprows) != list(range(1, len(skiprows) + 1)):
+        raise UnsupportedReadOptions(["header", "skiprows"])
+
+    dtype = read_options.get("dtype", {}) or {}
+    if not isinstance(dtype, dict):
+        raise UnsupportedReadOptions(["dtype"])
+
+    # Floats are parsed by pyarrow, every other declared type from strings as pandas would
+    column_types = {col: pyarrow.float64() if _is_float(col_type) else pyarrow.string() for col, col_type in dtype.items()}
+
+    def open_reader(column_types):
+        handle.seek(0)
+
+        return pyarrow_csv.open_csv(
+            handle,
+            read_options=pyarrow_csv.ReadOptions(use_threads=True, block_size=BLOCK_BYTES, skip_rows_after_names=len(skiprows)),
+            parse_options=pyarrow_csv.ParseOptions(delimiter=read_options.get("sep", ",")),
+            convert_options=pyarrow_csv.ConvertOptions(
+                include_columns=read_options.get("usecols", None) or [],
+                column_types=column_types,
+                null_values=NA_VALUES,
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=True,
+            ),
+        )
+
+    reader = open_reader(column_types)
+
+    # pyarrow infers dates in columns without a declared type, which pd.read_csv leaves as strings
+    dates = {field.name: pyarrow.string() for field in reader.schema if field.name not in column_types and pyarrow.types.is_temporal(field.type)}
+
+    if dates:
+        reader.close()
+        reader = open_reader({**column_types, **dates})
+
+    def chunks(reader):
+        rows = 0
+
+        # The reader reads ahead on threads of its own, it is closed before the stream is
+        try:
+            while True:
+                try:
+                    batch = reader.read_next_batch()
+                except StopIteration:
+                    return
+                except pyarrow.ArrowInvalid:
+                    raise UnsupportedReadOptions(["dtype"])
+
+                yield _to_pandas(pyarrow.Table.from_batches([batch]), dtype, start=rows)
+                rows += batch.num_rows
+        finally:
+            reader.close()
+
+    return chunks(reader)
+
+
+def _cell(value):
+    # Whole numbers are ints, as pd.read_excel converts them
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    # calamine gives dates without a time as dates, openpyxl as datetimes, which pandas parses to datetime64
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime(value.year, value.month, value.day)
+
+    return value
+
+
+@register("calamine", [".xlsx", ".xlsm", ".xls", ".xlsb", ".ods"], available=CalamineWorkbook is not None)
+def read_excel_calamine(path, read_options):
+    '''
+        Reads a sheet with calamine (python-calamine), a Rust workbook reader that is much faster than openpyxl.
+        Cells are converted to what openpyxl gives pd.read_excel (dates as datetimes, whole numbers as ints) and
+        parsed as pd.read_excel parses them.
+    '''
+    read_options = dict(read_options)
+    sheet_name = read_options.pop("sheet_name", 0)
+    read_options.setdefault("header", 0)
+
+    _check_options(read_options, ("header", "skiprows", "nrows", "usecols", "dtype", "na_values", "keep_default_na", "parse_dates", "thousands", "decimal", "true_values", "false_values", "converters"))
+
+    workbook = CalamineWorkbook.from_object(compression.seekable_source(path))
+    sheet = workbook.get_sheet_by_name(sheet_name) if isinstance(sheet_name, str) else workbook.get_sheet_by_index(sheet_name)
+
+    rows = [[_cell(value) for value in row] for row in sheet.to_python(skip_empty_area=False)]
+
+    if not rows:
+        return pd.DataFrame()
+
+    return TextParser(rows, skip_blank_lines=False, **read_options).read()
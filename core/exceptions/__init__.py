@@ -7,4 +7,30 @@ __SETTINGS_MODULE__ =  __RECON_SETTINGS_MODULE__
 class InvalidGroupingException(Exception):
     def __init__(self, message):
         self.message = f"An invalid group definition was encountered in your GROUPING configuration: {message}"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+
+class IngestionMemoryLimitExceeded(Exception):
+    def __init__(self, name, limit, rows, bytes_read):
+        self.message = f"Reading '{name}' exceeded the configured memory limit of {limit} bytes after {rows} rows ({bytes_read} bytes read)."
+        super().__init__(self.message)
+
+
+class UnsupportedReadOptions(Exception):
+    def __init__(self, options):
+        self.options = options
+        self.message = f"The reader engine does not support the read options: {', '.join(map(str, options))}"
+        super().__init__(self.message)
+
+
+class InvalidArchiveInput(Exception):
+    def __init__(self, name, path, files):
+        self.message = f"The archive given for '{name}' must hold exactly one file, {path} holds {files}."
+        super().__init__(self.message)
+
+
+class InvalidAmounts(Exception):
+    def __init__(self, column, values, count):
+        self.values = values
+        self.message = f"{count} values of the amount column '{column}' are not numbers, e.g. {', '.join(map(repr, values))}."
+        super().__init__(self.message)
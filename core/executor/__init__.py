@@ -0,0 +1,153 @@
+'''
+	A process-wide pool of workers shared by every Document.
+
+	The pool is created the first time it is needed and closed when the interpreter exits.
+	It is configured with the "EXECUTOR" definition in the settings module:
+
+		"processes": The number of worker processes (defaults to the number of CPU cores).
+		"start_method": The multiprocessing start method (e.g. "forkserver", "spawn", "fork").
+		"preload": Modules the forkserver should import once so that workers don't have to.
+		"fuse_mutations": Run a sequence of mutations on each chunk in a single trip to the pool.
+		"parallel_reads": Read independent files (e.g. the files of a folder) concurrently on the pool.
+		"shared_memory": Send chunks to the workers, and get the results back, through shared memory (see transport).
+'''
+
+import os
+import atexit
+import multiprocess as mp
+
+from document_reconciliation import __RECON_SETTINGS_MODULE__ as __SETTINGS_MODULE__
+from document_reconciliation.core.executor import transport
+
+
+_pool = None
+
+
+def _config():
+	return getattr(__SETTINGS_MODULE__, "EXECUTOR", {})
+
+
+def pool_size():
+	'''
+		The number of worker processes in the shared pool.
+	'''
+	return _config().get("processes", None) or os.cpu_count() or 1
+
+
+def fuse_mutations():
+	'''
+		Whether consecutive mutations should be fused into a single trip to the pool.
+	'''
+	return _config().get("fuse_mutations", True)
+
+
+def parallel_reads():
+	'''
+		Whether independent files should be read concurrently on the pool.
+	'''
+	return _config().get("parallel_reads", True)
+
+
+def shared_memory():
+	'''
+		Whether chunks should go to and from the workers through shared memory rather than the pipes of the pool.
+	'''
+	return _config().get("shared_memory", True)
+
+
+def in_worker():
+	'''
+		Whether this is one of the workers of the pool, which can't start a pool of its own, so work
+		meant for the pool is done in place.
+	'''
+	return mp.current_process().daemon
+
+
+def run_sequence(chunk, actions=()):
+	'''
+		Applies each of the actions, in order, to a chunk. This is what runs inside a worker when
+		mutations are fused.
+	'''
+	for action in actions:
+		chunk = action(chunk)
+
+	return chunk
+
+
+def map_frames(func, frames):
+	'''
+		Applies func to each of the frames on the shared pool and returns the results in order, like
+		pool.map. With "shared_memory" set, the frames and the results are sent as SharedFrames (see transport),
+		so only their descriptors are pickled.
+	'''
+	if not shared_memory():
+		return get_pool().map(func, frames)
+
+	sent = []
+	tasks = []
+	results = []
+
+	try:
+		for frame in frames:
+			sent.append(transport.send(frame))
+
+		#A task per frame rather than pool.map, so the results of the other frames can be found if one fails
+		pool = get_pool()
+		tasks = [pool.apply_async(transport.apply, (frame,), {"func": func}) for frame in sent]
+
+		for task in tasks:
+			results.append(transport.receive(task.get(), unlink=True))
+
+		return results
+	finally:
+		for frame in sent:
+			transport.release(frame)
+
+		#The results that weren't read, because a task failed or a result couldn't be received
+		for task in tasks[len(results):]:
+			try:
+				transport.release(task.get())
+			except Exception:
+				pass
+
+
+def _context():
+	config = _config()
+	start_method = config.get("start_method", None)
+
+	if start_method not in mp.get_all_start_methods():
+		return mp.get_context()
+
+	context = mp.get_context(start_method)
+
+	if start_method == "forkserver":
+		context.set_forkserver_preload(config.get("preload", []))
+
+	return context
+
+
+def get_pool():
+	'''
+		Returns the shared pool, creating it if it doesn't exist yet.
+	'''
+	global _pool
+
+	if _pool is None:
+		_pool = _context().Pool(pool_size())
+		atexit.register(shutdown)
+
+	return _pool
+
+
+def shutdown():
+	'''
+		Closes the shared pool and waits for its workers to exit.
+	'''
+	global _pool
+
+	if _pool is not None:
+		_pool.close()
+		_pool.join()
+		_pool = None
+
+		atexit.unregister(shutdown)
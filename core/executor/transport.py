@@ -0,0 +1,117 @@
+'''
+	Moves dataframes between the parent and the workers of the pool through shared memory.
+
+	A frame is pickled with protocol 5, which hands the data buffers of its columns (numpy arrays, Arrow
+	buffers) over out of band rather than copying them into the pickle. The buffers and the small pickle
+	stream that describes the frame are written to one shared memory block, and only a descriptor of the
+	block (a SharedFrame) goes through the pipes of the pool. What is sent to and from the workers no longer
+	grows with the frame, and frames come back with exactly the types they were sent with.
+
+	Blocks are always removed by the parent: the blocks of the frames it sent once the workers are done
+	with them, and the blocks of the results once it has read them.
+'''
+
+import pickle
+
+import pandas as pd
+from multiprocess import shared_memory
+
+
+#Frames smaller than this are pickled through the pipes as usual, a block costs more than it saves on them
+MIN_BYTES = 1024 ** 2
+
+
+class SharedFrame(object):
+
+	'''
+		A descriptor of a dataframe held in a shared memory block: the name of the block, and the size of
+		the pickle stream and of each of the out-of-band buffers that follow it in the block.
+	'''
+
+	def __init__(self, name, stream_size, buffer_sizes):
+
+		self.name = name
+		self.stream_size = stream_size
+		self.buffer_sizes = buffer_sizes
+
+
+
+def send(frame):
+	'''
+		Writes a dataframe to a new shared memory block and returns its SharedFrame. Anything else, and
+		frames smaller than MIN_BYTES, are returned as they are, to be pickled as usual.
+	'''
+	if not isinstance(frame, pd.DataFrame) or frame.memory_usage(deep=False).sum() < MIN_BYTES:
+		return frame
+
+	buffers = []
+	stream = pickle.dumps(frame, protocol=5, buffer_callback=buffers.append)
+	buffers = [buffer.raw() for buffer in buffers]
+
+	block = shared_memory.SharedMemory(create=True, size=len(stream) + sum(buffer.nbytes for buffer in buffers))
+
+	try:
+		offset = len(stream)
+		block.buf[:offset] = stream
+
+		for buffer in buffers:
+			block.buf[offset:offset + buffer.nbytes] = buffer
+			offset += buffer.nbytes
+
+		return SharedFrame(block.name, len(stream), [buffer.nbytes for buffer in buffers])
+	except BaseException:
+		block.unlink()
+		raise
+	finally:
+		block.close()
+
+
+def receive(frame, unlink=False):
+	'''
+		Reads the dataframe a SharedFrame describes, removing its block if unlink is set. Anything else is
+		returned as it is.
+	'''
+	if not isinstance(frame, SharedFrame):
+		return frame
+
+	block = shared_memory.SharedMemory(name=frame.name)
+
+	try:
+		stream = bytes(block.buf[:frame.stream_size])
+
+		#The buffers are copied out of the block, so the frame doesn't hold on to it and can be written to
+		buffers = []
+		offset = frame.stream_size
+
+		for size in frame.buffer_sizes:
+			buffers.append(bytearray(block.buf[offset:offset + size]))
+			offset += size
+
+		return pickle.loads(stream, buffers=buffers)
+	finally:
+		block.close()
+
+		if unlink:
+			block.unlink()
+
+
+def release(frame):
+	'''
+		Removes the block of a SharedFrame that will not be read anymore.
+	'''
+	if isinstance(frame, SharedFrame):
+		try:
+			block = shared_memory.SharedMemory(name=frame.name)
+		except FileNotFoundError:
+			return
+
+		block.close()
+		block.unlink()
+
+
+def apply(frame, func):
+	'''
+		Applies func to a frame sent with send, and sends its result back the same way. This is what runs
+		inside a worker.
+	'''
+	return send(func(receive(frame)))
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+'''
+	Encoding of string key columns (e.g. transaction ids) into 64-bit integers.
+'''
+
+
+class KeyEncoder(object):
+
+	'''
+		Replaces string key columns of several dataframes with 64-bit integer codes, so that matching,
+		isin, removing duplicates and grouping run on int64 arrays, and restores the strings for output.
+
+		Methods:
+			"dictionary": Every distinct key, across all the frames, gets a sequential code. Exact.
+			"hash": Every key is hashed to 64 bits. The hashes are verified against the original keys
+				and the column is dictionary encoded instead if two different keys share a hash.
+			None: Keys are left as they are.
+
+		Missing keys stay missing (as <NA> in a nullable Int64 column), so they never match.
+	'''
+
+	def __init__(self, method="dictionary"):
+
+		if method not in ("dictionary", "hash", None):
+			raise ValueError(f"Invalid key encoding method: {method}")
+
+		self._method = method
+
+		#For each encoded column, a Series of the original keys indexed by their code
+		self._decoders = {}
+
+
+
+	@property
+	def method(self):
+		return self._method
+
+
+
+	def _dictionary(self, values):
+		codes, uniques = pd.factorize(values)
+
+		return codes.astype(np.int64), pd.Series(np.asarray(uniques, dtype=object), index=np.arange(len(uniques), dtype=np.int64))
+
+
+	def _hash(self, values):
+		codes = pd.util.hash_array(np.asarray(values, dtype=object)).view(np.int64)
+
+		distinct = pd.DataFrame({"code": codes, "key": values}).drop_duplicates()
+
+		if distinct["code"].duplicated().any():
+			print(f"Hash collision while encoding {values.name}, using dictionary encoding instead.")
+			return self._dictionary(values)
+
+		return codes, pd.Series(distinct["key"].to_numpy(dtype=object), index=distinct["code"].to_numpy())
+
+
+	def encode(self, frames, cols):
+		'''
+			Encodes cols in each of the frames. Codes are shared across the frames, so equal keys in
+			different frames get equal codes.
+
+			Returns:
+				list: The frames with the encoded columns (the frames passed in are not modified).
+		'''
+		frames = [df.copy(deep=False) for df in frames]
+
+		if self.method is None:
+			return frames
+
+		for col in cols:
+			values = pd.concat([df[col] for df in frames], ignore_index=True)
+			missing = values.isna().to_numpy()
+
+			present = values[~missing].astype(str)
+
+			codes = np.zeros(len(values), dtype=np.int64)
+
+			if self.method == "hash":
+				codes[~missing], self._decoders[col] = self._hash(present)
+			else:
+				codes[~missing], self._decoders[col] = self._dictionary(present)
+
+			codes = pd.array(codes, dtype="Int64")
+			codes[missing] = pd.NA
+
+			start = 0
+			for df in frames:
+				column = codes[start:start + len(df)]
+				df[col] = pd.Series(column if column.isna().any() else column.to_numpy(dtype=np.int64), index=df.index)
+				start += len(df)
+
+		return frames
+
+
+	def decode(self, df):
+		'''
+			Restores the original keys in every encoded column of df.
+
+			Returns:
+				pd.DataFrame: A copy of df with the keys restored.
+		'''
+		df = df.copy(deep=False)
+
+		for col, decoder in self._decoders.items():
+			if col in df.columns:
+				df[col] = decoder.reindex(df[col].astype("Int64")).to_numpy()
+
+		return df
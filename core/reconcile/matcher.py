@@ -0,0 +1,527 @@
+import numpy as np
+import pandas as pd
+
+
+'''
+	Matching of the entries of two dataframes on a key column.
+'''
+
+
+class MatchResult(object):
+
+	'''
+		The outcome of matching two dataframes: the reconciled and outstanding entries of
+		each side, and a table pairing the index of every matched left entry with the index of
+		every right entry it matched.
+	'''
+
+	def __init__(self, left_reconciled, left_outstanding, right_reconciled, right_outstanding, pairs):
+		self.left_reconciled = left_reconciled
+		self.left_outstanding = left_outstanding
+		self.right_reconciled = right_reconciled
+		self.right_outstanding = right_outstanding
+		self.pairs = pairs
+
+
+	def extend(self, result):
+		'''
+			Combines this result with "result", the result of matching the outstanding entries of this one.
+		'''
+		return MatchResult(
+			left_reconciled=pd.concat([self.left_reconciled, result.left_reconciled]),
+			left_outstanding=result.left_outstanding,
+			right_reconciled=pd.concat([self.right_reconciled, result.right_reconciled]),
+			right_outstanding=result.right_outstanding,
+			pairs=pd.concat([self.pairs, result.pairs], ignore_index=True),
+		)
+
+
+
+class Matcher(object):
+
+	'''
+		Matches the entries of a left and a right dataframe that have the same value in the "on" column.
+
+		"on" may also be a list of key columns (tiers), in which case the matching cascades: entries are
+		first matched on the first key, the entries left outstanding are then matched on the second key,
+		and so on, each tier working on a smaller residual set.
+
+		The keys of both sides are hashed once per tier, together, into integer codes, so that equal keys
+		on either side share a code. Everything else (which entries matched, and the pairs) is worked out
+		from the codes with array operations, so later tiers only cost a few array lookups over the
+		residuals. Entries with a missing key never match.
+	'''
+
+	def __init__(self, left, right, on):
+
+		self._left = left
+		self._right = right
+		self._tiers = [on] if isinstance(on, str) else list(on)
+
+		#The codes of the left and right keys and the distinct keys, for each tier
+		self._index = {}
+
+
+
+	@property
+	def left(self):
+		return self._left
+
+
+	@property
+	def right(self):
+		return self._right
+
+
+	@property
+	def tiers(self):
+		return self._tiers
+
+
+
+	def _build_index(self, ):
+		'''
+			Encodes the keys of both sides into codes (-1 for missing keys), for every tier.
+		'''
+		for tier in self.tiers:
+			if tier in self._index:
+				continue
+
+			keys = pd.concat([self.left[tier], self.right[tier]], ignore_index=True)
+
+			codes, uniques = pd.factorize(keys)
+
+			self._index[tier] = (codes[:len(self.left)], codes[len(self.left):], uniques)
+
+
+	def _present(self, codes, key_count):
+		'''
+			A boolean array, indexed by code, of the keys present in codes. It has an extra
+			(always False) slot at the end, which is what missing keys (code -1) index into.
+		'''
+		present = np.zeros(key_count + 1, dtype=bool)
+		present[codes[codes >= 0]] = True
+
+		return present
+
+
+	def _pairs(self, tier, left_positions, right_positions):
+		'''
+			Joins the codes of the matched entries of both sides to pair up their indexes.
+		'''
+		left_codes, right_codes, keys = self._index[tier]
+
+		left = pd.DataFrame({"code": left_codes[left_positions], "left_index": self.left.index[left_positions]})
+		right = pd.DataFrame({"code": right_codes[right_positions], "right_index": self.right.index[right_positions]})
+
+		pairs = left.merge(right, on="code")
+		pairs.insert(0, "key", np.asarray(keys).take(pairs.pop("code").to_numpy()))
+		pairs.insert(0, "tier", tier)
+
+		return pairs
+
+
+	def match(self, ):
+		'''
+			Matches the two sides, tier by tier, on the residuals of the previous tier.
+
+			Returns:
+				MatchResult: The reconciled and outstanding entries of each side, and the match pairs
+				(with the tier each pair was matched on).
+		'''
+		self._build_index()
+
+		#Positions of the entries not matched yet
+		left_remaining = np.arange(len(self.left))
+		right_remaining = np.arange(len(self.right))
+
+		pairs = []
+
+		for tier in self.tiers:
+			left_codes, right_codes, keys = self._index[tier]
+
+			left_residual_codes = left_codes[left_remaining]
+			right_residual_codes = right_codes[right_remaining]
+
+			left_matched = self._present(right_residual_codes, len(keys))[left_residual_codes]
+			right_matched = self._present(left_residual_codes, len(keys))[right_residual_codes]
+
+			pairs.append(self._pairs(tier, left_remaining[left_matched], right_remaining[right_matched]))
+
+			left_remaining = left_remaining[~left_matched]
+			right_remaining = right_remaining[~right_matched]
+
+		left_outstanding = np.zeros(len(self.left), dtype=bool)
+		left_outstanding[left_remaining] = True
+
+		right_outstanding = np.zeros(len(self.right), dtype=bool)
+		right_outstanding[right_remaining] = True
+
+		return MatchResult(
+			left_reconciled=self.left.take(np.flatnonzero(~left_outstanding)),
+			left_outstanding=self.left.take(left_remaining),
+			right_reconciled=self.right.take(np.flatnonzero(~right_outstanding)),
+			right_outstanding=self.right.take(right_remaining),
+			pairs=pd.concat(pairs, ignore_index=True),
+		)
+
+
+
+def amounts_in_minor_units(series, scale=100, minor_units=False):
+	'''
+		The amounts of a column as int64 minor units, with missing amounts as 0. If "minor_units" is set the
+		column already holds minor units (see Document.amounts) and is only cast, otherwise it holds decimals.
+
+		Returns:
+			tuple: (the amounts, whether each amount is present)
+	'''
+	values = series.astype(float).to_numpy()
+	present = ~np.isnan(values)
+
+	if minor_units:
+		return series.fillna(0).to_numpy(dtype=np.int64), present
+
+	return np.round(np.nan_to_num(values) * scale).astype(np.int64), present
+
+
+
+class ToleranceMatcher(object):
+
+	'''
+		Pairs entries of a left and a right dataframe (typically the outstanding entries left by a Matcher)
+		that have the same "block_on" value (e.g. the RRN), whose amounts differ by at most "amount" and whose
+		dates are at most "days" days apart. Entries with a missing "block_on" value, amount or date never match.
+
+		Instead of comparing every left entry with every right entry, the right entries are sorted by
+		(block, amount) and, for each left entry, the entries of its block within the amount window are found
+		with a single binary search and then filtered on the date window. Among the candidates, the closest
+		pairs (by amount, then date) are accepted one-to-one; entries that lost a conflict are tried again in
+		the next of up to "rounds" rounds.
+
+		Amounts are compared in minor units ("scale" minor units to one unit of currency), the tolerance is given
+		in units of currency. Set "minor_units" if the amount column already holds minor units.
+	'''
+
+	def __init__(self, left, right, block_on="rrn", amount_col="Amount", date_col="Valdate", amount=0.01, days=1, rounds=5, scale=100, minor_units=False):
+
+		if not block_on:
+			raise ValueError("ToleranceMatcher needs a \"block_on\" key, pairing on amount and date alone is not safe.")
+
+		self._left = left
+		self._right = right
+		self._block_on = [block_on] if isinstance(block_on, str) else list(block_on)
+		self._amount_col = amount_col
+		self._date_col = date_col
+		self._tolerance = int(round(amount * scale))
+		self._days = int(days)
+		self._rounds = rounds
+		self._scale = scale
+		self._minor_units = minor_units
+
+
+
+	@property
+	def left(self):
+		return self._left
+
+
+	@property
+	def right(self):
+		return self._right
+
+
+
+	def _prepare(self, ):
+		'''
+			Encodes the block keys of both sides into codes, converts amounts to integer minor units ranked into
+			dense codes, and dates to day numbers.
+		'''
+		#Equal keys on either side share a code, missing keys are -1
+		keys = pd.concat([self.left[self._block_on], self.right[self._block_on]], ignore_index=True)
+		blocks = keys.groupby(self._block_on, sort=False, dropna=True).ngroup().to_numpy()
+
+		self._left_blocks = blocks[:len(self.left)]
+		self._right_blocks = blocks[len(self.left):]
+
+		left_amounts, left_present = amounts_in_minor_units(self.left[self._amount_col], self._scale, self._minor_units)
+		right_amounts, right_present = amounts_in_minor_units(self.right[self._amount_col], self._scale, self._minor_units)
+
+		#Sorted distinct amounts; an amount's position in it is its code
+		self._amounts = np.unique(np.concatenate([left_amounts, right_amounts]))
+		self._left_codes = np.searchsorted(self._amounts, left_amounts)
+		self._right_codes = np.searchsorted(self._amounts, right_amounts)
+
+		left_dates = pd.to_datetime(self.left[self._date_col])
+		right_dates = pd.to_datetime(self.right[self._date_col])
+
+		self._left_valid = left_dates.notna().to_numpy() & left_present & (self._left_blocks >= 0)
+		self._right_valid = right_dates.notna().to_numpy() & right_present & (self._right_blocks >= 0)
+
+		self._left_days = left_dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+		self._right_days = right_dates.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+	def _candidates(self, left_positions, right_positions):
+		'''
+			Finds the candidate pairs between the given (unmatched) left and right entries.
+
+			Returns:
+				tuple: (left positions, right positions) of the candidate pairs.
+		'''
+		#Sorting the right entries by (block, amount code) makes the entries of a block within an amount window contiguous
+		span = len(self._amounts)
+
+		right_keys = self._right_blocks[right_positions] * span + self._right_codes[right_positions]
+		order = np.argsort(right_keys, kind="stable")
+		right_keys = right_keys[order]
+		right_positions = right_positions[order]
+
+		left_amounts = self._amounts[self._left_codes[left_positions]]
+		blocks = self._left_blocks[left_positions] * span
+
+		low = np.searchsorted(right_keys, blocks + np.searchsorted(self._amounts, left_amounts - self._tolerance, side="left"), side="left")
+		high = np.searchsorted(right_keys, blocks + np.searchsorted(self._amounts, left_amounts + self._tolerance, side="right"), side="left")
+
+		size = high - low
+		total = size.sum()
+
+		#Expand every left entry into the entries of its window
+		owner = np.repeat(np.arange(len(left_positions)), size)
+		step = np.arange(total) - np.repeat(np.cumsum(size) - size, size)
+
+		candidate_left = left_positions[owner]
+		candidate_right = right_positions[low[owner] + step]
+
+		within = np.abs(self._left_days[candidate_left] - self._right_days[candidate_right]) <= self._days
+
+		return candidate_left[within], candidate_right[within]
+
+
+	def match(self, ):
+		'''
+			Returns:
+				MatchResult: The reconciled and outstanding entries of each side, and the pairs
+				(with their block key and their amount and day differences).
+		'''
+		self._prepare()
+
+		left_matched = ~self._left_valid
+		right_matched = ~self._right_valid
+
+		accepted = []
+
+		for _ in range(self._rounds):
+			left_positions = np.flatnonzero(~left_matched)
+			right_positions = np.flatnonzero(~right_matched)
+
+			if len(left_positions) == 0 or len(right_positions) == 0:
+				break
+
+			candidate_left, candidate_right = self._candidates(left_positions, right_positions)
+
+			candidates = pd.DataFrame({
+				"left": candidate_left,
+				"right": candidate_right,
+				"amount_difference": np.abs(self._amounts[self._left_codes[candidate_left]] - self._amounts[self._right_codes[candidate_right]]),
+				"day_difference": np.abs(self._left_days[candidate_left] - self._right_days[candidate_right]),
+			})
+
+			#Closest pairs first, then each entry keeps only its closest pair
+			candidates = candidates.sort_values(["amount_difference", "day_difference"], kind="stable")
+			candidates = candidates.drop_duplicates("left").drop_duplicates("right")
+
+			if candidates.empty:
+				break
+
+			left_matched[candidates["left"].to_numpy()] = True
+			right_matched[candidates["right"].to_numpy()] = True
+
+			accepted.append(candidates)
+
+		#Entries that couldn't be matched for lack of a date or amount are outstanding, not matched
+		left_matched &= self._left_valid
+		right_matched &= self._right_valid
+
+		pairs = pd.concat(accepted, ignore_index=True) if accepted else pd.DataFrame(columns=["left", "right", "amount_difference", "day_difference"])
+
+		pairs = pd.DataFrame({
+			"tier": "tolerance",
+			"key": self.left[self._block_on[0]].to_numpy()[pairs["left"].to_numpy(dtype=np.int64)] if len(self._block_on) == 1 else list(self.left[self._block_on].take(pairs["left"].to_numpy(dtype=np.int64)).itertuples(index=False, name=None)),
+			"left_index": self.left.index[pairs["left"].to_numpy(dtype=np.int64)],
+			"right_index": self.right.index[pairs["right"].to_numpy(dtype=np.int64)],
+			"amount_difference": pairs["amount_difference"].to_numpy() / self._scale,
+			"day_difference": pairs["day_difference"].to_numpy(),
+		})
+
+		return MatchResult(
+			left_reconciled=self.left.take(np.flatnonzero(left_matched)),
+			left_outstanding=self.left.take(np.flatnonzero(~left_matched)),
+			right_reconciled=self.right.take(np.flatnonzero(right_matched)),
+			right_outstanding=self.right.take(np.flatnonzero(~right_matched)),
+			pairs=pairs,
+		)
+
+
+
+class SplitMatcher(object):
+
+	'''
+		Matches an entry on one side to two or more entries on the other side (e.g. a settlement booked in the
+		ledger as several partial postings) that share its "group_on" value and whose amounts add up to its
+		amount, within "tolerance".
+
+		Only groups with entries on both sides are searched. Within a group, each entry of one side is matched
+		against a subset of the still unmatched entries of the other side, found with a depth-first search that
+		prunes branches which can no longer reach the amount. The search is bounded: groups with more than
+		"max_group_size" entries on the side being searched are skipped, and each search gives up after
+		visiting "max_nodes" subsets.
+
+		Amounts are compared in minor units ("scale" minor units to one unit of currency), the tolerance is given
+		in units of currency. Set "minor_units" if the amount column already holds minor units.
+	'''
+
+	def __init__(self, left, right, group_on="rrn", amount_col="Amount", tolerance=0, max_group_size=12, max_nodes=10000, scale=100, minor_units=False):
+
+		self._left = left
+		self._right = right
+		self._group_on = group_on
+		self._amount_col = amount_col
+		self._tolerance = int(round(tolerance * scale))
+		self._max_group_size = max_group_size
+		self._max_nodes = max_nodes
+		self._scale = scale
+		self._minor_units = minor_units
+
+
+
+	@property
+	def left(self):
+		return self._left
+
+
+	@property
+	def right(self):
+		return self._right
+
+
+
+	def _amounts(self, df):
+		return amounts_in_minor_units(df[self._amount_col], self._scale, self._minor_units)[0]
+
+
+	def _subset(self, target, amounts):
+		'''
+			Finds at least two positions in amounts whose sum is within the tolerance of target. A single entry
+			is not a split: an entry matching one posting of several with the same key is a duplicate, and is
+			left outstanding.
+
+			Returns:
+				list: The positions, or None if no subset was found within the search budget.
+		'''
+		order = sorted(range(len(amounts)), key=lambda i: -abs(amounts[i]))
+		values = [amounts[i] for i in order]
+
+		#The most and the least the remaining values can still add
+		most = [0] * (len(values) + 1)
+		least = [0] * (len(values) + 1)
+		for i in range(len(values) - 1, -1, -1):
+			most[i] = most[i + 1] + max(values[i], 0)
+			least[i] = least[i + 1] + min(values[i], 0)
+
+		budget = [self._max_nodes]
+		chosen = []
+
+		def search(start, total):
+			if len(chosen) >= 2 and abs(total - target) <= self._tolerance:
+				return True
+
+			for i in range(start, len(values)):
+				budget[0] -= 1
+				if budget[0] < 0:
+					return False
+
+				if not (total + values[i] + least[i + 1] - self._tolerance <= target <= total + values[i] + most[i + 1] + self._tolerance):
+					continue
+
+				chosen.append(order[i])
+				if search(i + 1, total + values[i]):
+					return True
+				chosen.pop()
+
+			return False
+
+		return list(chosen) if search(0, 0) else None
+
+
+	def _match_group(self, one_positions, one_amounts, many_positions, many_amounts, many_matched, pairs, swap):
+		'''
+			Matches each entry of the "one" side of a group with a subset of the unmatched entries of the "many" side.
+
+			Returns:
+				list: The positions of the entries of the "one" side that were matched.
+		'''
+		matched = []
+
+		for position, amount in zip(one_positions, one_amounts):
+			available = [i for i in range(len(many_positions)) if not many_matched[many_positions[i]]]
+
+			if len(available) < 2 or len(available) > self._max_group_size:
+				continue
+
+			subset = self._subset(amount, [many_amounts[i] for i in available])
+
+			if subset is None:
+				continue
+
+			for i in subset:
+				many_matched[many_positions[available[i]]] = True
+				pairs.append((many_positions[available[i]], position) if swap else (position, many_positions[available[i]]))
+
+			matched.append(position)
+
+		return matched
+
+
+	def match(self, ):
+		'''
+			Returns:
+				MatchResult: The reconciled and outstanding entries of each side, and a pair for every leg of
+				every split match.
+		'''
+		left_amounts = self._amounts(self.left)
+		right_amounts = self._amounts(self.right)
+
+		left_groups = pd.Series(np.arange(len(self.left))).groupby(self.left[self._group_on].to_numpy()).indices
+		right_groups = pd.Series(np.arange(len(self.right))).groupby(self.right[self._group_on].to_numpy()).indices
+
+		left_matched = np.zeros(len(self.left), dtype=bool)
+		right_matched = np.zeros(len(self.right), dtype=bool)
+
+		pairs = []
+
+		for key in sorted(left_groups.keys() & right_groups.keys(), key=str):
+			left_positions = left_groups[key]
+			right_positions = right_groups[key]
+
+			#One left entry split over several right entries
+			left_matched[self._match_group(left_positions, left_amounts[left_positions], right_positions, right_amounts[right_positions], right_matched, pairs, swap=False)] = True
+
+			#One right entry split over several left entries
+			remaining = left_positions[~left_matched[left_positions]]
+			unmatched_right = right_positions[~right_matched[right_positions]]
+			right_matched[self._match_group(unmatched_right, right_amounts[unmatched_right], remaining, left_amounts[remaining], left_matched, pairs, swap=True)] = True
+
+		pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+		return MatchResult(
+			left_reconciled=self.left.take(np.flatnonzero(left_matched)),
+			left_outstanding=self.left.take(np.flatnonzero(~left_matched)),
+			right_reconciled=self.right.take(np.flatnonzero(right_matched)),
+			right_outstanding=self.right.take(np.flatnonzero(~right_matched)),
+			pairs=pd.DataFrame({
+				"tier": "split",
+				"key": self.left[self._group_on].to_numpy()[pairs[:, 0]],
+				"left_index": self.left.index[pairs[:, 0]],
+				"right_index": self.right.index[pairs[:, 1]],
+			}),
+		)
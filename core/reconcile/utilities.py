@@ -1,10 +1,12 @@
 import os, sys
+import numpy as np
 import pandas as pd
 from copy import deepcopy
 import logging
 import argparse
 import pprint
-from document_reconciliation.core.exceptions import InvalidGroupingException
+from document_reconciliation.core.exceptions import InvalidGroupingException, InvalidArchiveInput
+from document_reconciliation.core.documents import compression
 from document_reconciliation.actions import merge_dictionaries
 
 from document_reconciliation import __RECON_SETTINGS_MODULE__ as __SETTINGS_MODULE__
@@ -208,6 +210,9 @@ class ReconciliationUtilities(object):
 	def map_args(self, maps_to=None):
 		'''
 			Maps the files and folders defined in the config to their actual path gotten from the args.
+
+			Zip archives are read without being unpacked: the files in an archive in a folder are files of the
+			folder, and a file input can be an archive holding just that file (see core.documents.compression).
 		'''
 
 		settings = self.settings
@@ -220,9 +225,27 @@ class ReconciliationUtilities(object):
 						if hasattr(self.input_args, subkey):
 							path = getattr(self.input_args, subkey)
 							if os.path.isdir(path):
-								value[subkey]["files"] = [os.path.join(path, file) for file in os.listdir(path)]
+								#The sizes come with the directory scan, they are used to read the largest files first
+								file_sizes = {}
+
+								for entry in os.scandir(path):
+									if compression.is_archive(entry.path):
+										file_sizes.update(compression.members(entry.path))
+									elif compression.is_compressed(entry.path):
+										file_sizes[entry.path] = compression.input_size(entry.path)
+									else:
+										file_sizes[entry.path] = entry.stat().st_size
+
+								value[subkey]["files"] = list(file_sizes)
+								value[subkey]["file_sizes"] = file_sizes
 							elif os.path.isfile(path):
-								pass
+								if compression.is_archive(path):
+									archived = list(compression.members(path))
+
+									if len(archived) != 1:
+										raise InvalidArchiveInput(subkey, path, len(archived))
+
+									path = archived[0]
 							else:
 								if "create_if_not_exist" in value[subkey].get("config", []).keys():
 									os.makedirs(path) if value[subkey].get("config", [])["create_if_not_exist"] else None
@@ -238,20 +261,61 @@ class ReconciliationUtilities(object):
 		return df.drop_duplicates(subset=[column], keep=False)
 
 
-	def drop_and_get_duplicates(self, df, subset_cols):
-		# Sort the DataFrame by the subset columns
-		df.sort_values(by=subset_cols, inplace=True)
+	def partition_duplicates(self, df, subset_cols):
+		'''
+			Splits df into the entries whose values in subset_cols are unique and the entries that share
+			them with another entry, with a single hash of the key columns and no sorting.
+
+			Returns:
+				tuple: (the unique entries, the duplicates). The caller's frame is not modified.
+		'''
+		mask = df.duplicated(subset=subset_cols, keep=False).to_numpy()
+
+		return df[~mask], df[mask]
 
-		# Create a boolean mask to identify duplicates
-		mask = df.duplicated(subset=subset_cols, keep=False)
+
+	def drop_and_get_duplicates(self, df, subset_cols):
+		'''
+			Drops the duplicates (see partition_duplicates) from df in place and returns them.
+		'''
+		mask = df.duplicated(subset=subset_cols, keep=False).to_numpy()
 
 		# Extract the duplicates into a new DataFrame
 		duplicates_df = df[mask].copy()
 
 		# Drop the duplicates from the original DataFrame
-		df.drop_duplicates(subset=subset_cols, keep=False, inplace=True)
+		df.drop(df.index[mask], inplace=True)
 
 		return duplicates_df
 
 
+	def net_reversals(self, df, subset_cols, amount_col="Amount", tolerance=0.005, min_legs=2, scale=100, minor_units=False):
+		'''
+			Finds groups of entries (with the same values in subset_cols) that reverse each other, i.e.
+			groups of at least min_legs entries whose amounts net to zero within tolerance.
+
+			The size and the sum of every group are computed in one pass over integer group codes, so no
+			Python function is called per group.
+
+			If "minor_units" is set, amount_col holds integer minor units ("scale" to one unit of currency, in
+			which the tolerance is given) and the sums are exact integer sums.
+
+			Returns:
+				tuple: (the entries that net to zero, the remaining entries). The caller's frame is not modified.
+		'''
+		keys = df[subset_cols]
+
+		codes = df.groupby(subset_cols, sort=False, dropna=False).ngroup().to_numpy()
+		sizes = np.bincount(codes)
+
+		if minor_units:
+			tolerance = int(round(tolerance * scale))
+
+			sums = np.zeros(len(sizes), dtype=np.int64)
+			np.add.at(sums, codes, df[amount_col].fillna(0).to_numpy(dtype=np.int64))
+		else:
+			sums = np.bincount(codes, weights=df[amount_col].to_numpy(dtype=float))
+
+		mask = (sizes[codes] >= min_legs) & (np.abs(sums[codes]) <= tolerance) & keys.notna().all(axis=1).to_numpy()
 
+		return df[mask], df[~mask]
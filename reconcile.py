@@ -6,11 +6,15 @@ from copy import deepcopy
 
 
 from document_reconciliation.core.reconcile.utilities import ReconciliationUtilities
-from document_reconciliation.core.documents.document import Document
+from document_reconciliation.core.reconcile.keys import KeyEncoder
+from document_reconciliation.core.reconcile.matcher import Matcher, ToleranceMatcher, SplitMatcher
+from document_reconciliation.core.documents.document import Document, read_documents
+from document_reconciliation.core import cache
+from document_reconciliation.core.cache.manifest import Manifest
 import document_reconciliation.sequence as sequence
 
  
-from document_reconciliation.actions import update_dict
+from document_reconciliation.actions import update_dict, from_minor_units
 from document_reconciliation.actions.mutations import create_total_amount_row, include_only_cols
 
 # import line_profiler
@@ -62,6 +66,8 @@ def main():
 
 	#Main output directory
 	output_dir = getattr(recon_util.settings, "PROCESS_OUTPUTS")["folders"]["main_output"]["path"]
+	#Options for writing the output files (dates are only formatted here)
+	write_options = getattr(recon_util.settings, "PROCESS_OUTPUTS")["folders"]["main_output"]["config"].get("pandas", {}).get("write", {"index": False})
 
 	'''
 		FOR INPUT FILES:
@@ -78,20 +84,43 @@ def main():
 		Open each of the folders, read their files, make each file a Document object, combine all into 
 		one Document object.
 	'''
+	#The files of every folder, read together so that the pool can balance them
+	folder_docs = []
+	folder_file_sizes = {}
+
+	#Files ingested by a previous run and unchanged since are loaded from the cache without being read
+	manifest = Manifest(cache.manifest_path()) if cache.incremental() else None
+
 	for name, folder in recon_util.__inputs__("folders").items():
 		folder_files = folder.pop("files")
+		folder_file_sizes.update(folder.pop("file_sizes", {}))
 
-		#A list of  the Document objects representing each file in the folder.
-		docs = []
+		if manifest:
+			new_files = [file for file in folder_files if not manifest.is_ingested(file)]
+			print(f"{name}: {len(new_files)} new or changed of {len(folder_files)} files")
 
-		#Make each created object into a Document object
+		#Make each file of the folder into the definition of a Document object
 		for file in folder_files:
 			file_dict = deepcopy(folder)
 			file_dict["path"] = file
-			doc = Document(dict({name:file_dict}))
-			doc._set_dataframe(create_total_amount_row(doc.dataframe, report_name=name))
-			docs.append(doc)
 
+			if manifest:
+				#Only the hashes the manifest has, the workers hash the new and changed files as they read them
+				file_dict["content_hash"] = manifest.content_hash(file)
+				file_dict["hash_content"] = file_dict["content_hash"] is None
+
+			folder_docs.append(dict({name:file_dict}))
+
+	#Read the files concurrently, each with a "total amount" row added by the worker that read it.
+	docs = read_documents(folder_docs, folder_file_sizes, on_read=create_total_amount_row)
+
+	if manifest:
+		for doc in docs:
+			manifest.record(doc.path, doc.content_hash)
+
+		manifest.save()
+
+	if docs:
 		#Combine all the Document objects to the first created Document object to make them one Document object, representing one file.
 		docs = docs[0]._append_document(docs[1:])
 
@@ -218,29 +247,32 @@ def main():
 	id_col = "transaction_id"
 	secondary_id_col = "secondary_transaction_id"
 
+	#Match, dedupe and group on 64-bit integer codes instead of the key strings (restored before writing)
+	key_encoder = KeyEncoder(getattr(recon_util.settings, "RECONCILIATION", {}).get("key_encoding", None))
+	spb_df, ledger_df = key_encoder.encode([spb_df, ledger_df], [id_col, secondary_id_col])
+
+	#How far from zero the amounts of reversed entries may net, to allow for rounding
+	reversal_tolerance = getattr(recon_util.settings, "RECONCILIATION", {}).get("reversal_tolerance", 0.005)
+
+	#Whether the amounts are held in integer minor units (see Document.amounts), and how many make a unit of currency
+	amounts = getattr(recon_util.settings, "AMOUNTS", {})
+	amount_options = {"scale": amounts.get("scale", 100), "minor_units": amounts.get("minor_units", False)}
+
 	##
 	##----------------HANDLE DUPLICATES------------------##
 	##
 	##[INTERSWITCH]
 	##
-	spb_df_dups = recon_util.drop_and_get_duplicates(spb_df, [id_col])
-	#Identify duplicates that have inverse copies (i.e. with a positive and negative entry)
-	spb_inverse_dups = spb_df_dups.groupby(id_col).filter(
-		lambda x: (x['Amount'].sum() == 0) and len(x) == 2
-	)
-
-	spb_df_dups.drop(spb_inverse_dups.index, inplace=True)
+	spb_df, spb_df_dups = recon_util.partition_duplicates(spb_df, [id_col])
+	#Identify duplicates that have inverse copies (i.e. entries that net to zero, such as a positive and a negative entry)
+	spb_inverse_dups, spb_df_dups = recon_util.net_reversals(spb_df_dups, [id_col], "Amount", reversal_tolerance, **amount_options)
 
 	##
 	##[LEDGER]
 	##
-	ledger_df_dups = recon_util.drop_and_get_duplicates(ledger_df, [id_col])
-	# Identify duplicates that have inverse copies (i.e. with a positive and negative entry)
-	ledger_inverse_dups = ledger_df_dups.groupby(id_col).filter(
-		lambda x: (x['Amount'].sum() == 0) and len(x) == 2
-	)
-
-	ledger_df_dups.drop(ledger_inverse_dups.index, inplace=True)
+	ledger_df, ledger_df_dups = recon_util.partition_duplicates(ledger_df, [id_col])
+	#Identify duplicates that have inverse copies (i.e. entries that net to zero, such as a positive and a negative entry)
+	ledger_inverse_dups, ledger_df_dups = recon_util.net_reversals(ledger_df_dups, [id_col], "Amount", reversal_tolerance, **amount_options)
 
 
 	#############################################################
@@ -253,13 +285,38 @@ def main():
 	###
 	###[INTERSWITCH]----------------RECONCILIATION------------------##
 	###
-	spb_reconciled = spb_df[
-		spb_df[id_col].isin(ledger_df[id_col])
-	]
+	#Match on the transaction id, then match what is left on the secondary id, and so on
+	match_tiers = getattr(recon_util.settings, "RECONCILIATION", {}).get("match_tiers", [id_col])
+
+	match = Matcher(spb_df, ledger_df, on=match_tiers).match()
+
+	#Pair what is still outstanding on the blocking key (e.g. the RRN), amount and date, within the configured tolerances.
+	#These are near matches for review, so they are written to outputs of their own rather than with the exact matches.
+	tolerance = getattr(recon_util.settings, "RECONCILIATION", {}).get("tolerance", None)
+	tolerance_match = None
+
+	if tolerance:
+		tolerance_match = ToleranceMatcher(match.left_outstanding, match.right_outstanding, **{**amount_options, **tolerance}).match()
 
-	spb_unreconciled = spb_df[
-		~spb_df[id_col].isin(ledger_df[id_col]) 
-	]
+		match.left_outstanding = tolerance_match.left_outstanding
+		match.right_outstanding = tolerance_match.right_outstanding
+
+	#Match entries split into several postings on the other side. Duplicates are included as partial postings share
+	#the same transaction id, but those that don't complete a split are left out of the output, as before.
+	split = getattr(recon_util.settings, "RECONCILIATION", {}).get("split", None)
+
+	if split:
+		split_match = SplitMatcher(
+			pd.concat([match.left_outstanding, spb_df_dups]), pd.concat([match.right_outstanding, ledger_df_dups]), **{**amount_options, **split}
+		).match()
+
+		split_match.left_outstanding = split_match.left_outstanding.drop(spb_df_dups.index, errors="ignore")
+		split_match.right_outstanding = split_match.right_outstanding.drop(ledger_df_dups.index, errors="ignore")
+
+		match = match.extend(split_match)
+
+	spb_reconciled = match.left_reconciled
+	spb_unreconciled = match.left_outstanding
 
 
 
@@ -273,13 +330,47 @@ def main():
 	##
 	##[LEDGER]----------------RECONCILIATION------------------##
 	##
-	ledger_reconciled = ledger_df[
-		ledger_df[id_col].isin(spb_df[id_col])
-	]
+	ledger_reconciled = match.right_reconciled
+	ledger_unreconciled = match.right_outstanding
+
+
+	##----------------RESTORE KEYS------------------##
+	##
+	spb_reconciled = key_encoder.decode(spb_reconciled)
+	spb_unreconciled = key_encoder.decode(spb_unreconciled)
+
+	ledger_reconciled = key_encoder.decode(ledger_reconciled)
+	ledger_unreconciled = key_encoder.decode(ledger_unreconciled)
+
+	if tolerance_match:
+		spb_tolerance = key_encoder.decode(tolerance_match.left_reconciled)
+		ledger_tolerance = key_encoder.decode(tolerance_match.right_reconciled)
+
+		#Each pair with the transaction ids of both entries, instead of their positions in the dataframes
+		tolerance_pairs = pd.DataFrame({
+			"key": tolerance_match.pairs["key"].to_numpy(),
+			"settlement_transaction_id": spb_tolerance.loc[tolerance_match.pairs["left_index"], id_col].to_numpy(),
+			"ledger_transaction_id": ledger_tolerance.loc[tolerance_match.pairs["right_index"], id_col].to_numpy(),
+			"amount_difference": tolerance_match.pairs["amount_difference"].to_numpy(),
+			"day_difference": tolerance_match.pairs["day_difference"].to_numpy(),
+		})
+
+	##----------------RESTORE AMOUNTS------------------##
+	##
+	#Amounts held in minor units are rendered as decimals only for writing
+	if amount_options["minor_units"]:
+		spb_special = spb_special.assign(**{col: from_minor_units(spb_special[col], scale) for col, scale in spb.amounts.items()})
+		ledger_manual_posting = ledger_manual_posting.assign(**{col: from_minor_units(ledger_manual_posting[col], scale) for col, scale in ledger.amounts.items()})
+
+		spb_reconciled["Amount"] = from_minor_units(spb_reconciled["Amount"], amount_options["scale"])
+		spb_unreconciled["Amount"] = from_minor_units(spb_unreconciled["Amount"], amount_options["scale"])
 
-	ledger_unreconciled = ledger_df[
-		~ledger_df[id_col].isin(spb_df[id_col])
-	]
+		ledger_reconciled["Amount"] = from_minor_units(ledger_reconciled["Amount"], amount_options["scale"])
+		ledger_unreconciled["Amount"] = from_minor_units(ledger_unreconciled["Amount"], amount_options["scale"])
+
+		if tolerance_match:
+			spb_tolerance["Amount"] = from_minor_units(spb_tolerance["Amount"], amount_options["scale"])
+			ledger_tolerance["Amount"] = from_minor_units(ledger_tolerance["Amount"], amount_options["scale"])
 
 
 	##[LEDGER]----------------SORTING------------------##
@@ -294,10 +385,10 @@ def main():
 
 
 	print(f"{output_dir}SETTLEMENT BULK.csv")
-	spb_special.to_csv(f"{output_dir}SETTLEMENT BULK.csv", index=False)
+	spb_special.to_csv(f"{output_dir}SETTLEMENT BULK.csv", **write_options)
 
 	print(f"{output_dir}LEDGER MANUAL.csv")
-	ledger_manual_posting.to_csv(f"{output_dir}LEDGER MANUAL.csv", index=False)
+	ledger_manual_posting.to_csv(f"{output_dir}LEDGER MANUAL.csv", **write_options)
 
 
 	#############################################################
@@ -311,20 +402,33 @@ def main():
 	##[TSS]----------------OUTPUT------------------##
 	##
 	print(f"{output_dir}SETTLEMENT OUTSTANDING.csv")
-	spb_unreconciled.to_csv(f"{output_dir}SETTLEMENT OUTSTANDING.csv", index=False)
+	spb_unreconciled.to_csv(f"{output_dir}SETTLEMENT OUTSTANDING.csv", **write_options)
 
 	print(f"{output_dir}SETTLEMENT RECONCILED.csv")
-	spb_reconciled.to_csv(f"{output_dir}SETTLEMENT RECONCILED.csv", index=False)
+	spb_reconciled.to_csv(f"{output_dir}SETTLEMENT RECONCILED.csv", **write_options)
 
 
 	##[LEDGER]----------------OUTPUT------------------##
 	##
 
 	print(f"{output_dir}LEDGER RECONCILED.csv")
-	ledger_reconciled.to_csv(f"{output_dir}LEDGER RECONCILED.csv", index=False)
+	ledger_reconciled.to_csv(f"{output_dir}LEDGER RECONCILED.csv", **write_options)
 
 	print(f"{output_dir}LEDGER OUTSTANDING.csv")
-	ledger_unreconciled.to_csv(f"{output_dir}LEDGER OUTSTANDING.csv", index=False)
+	ledger_unreconciled.to_csv(f"{output_dir}LEDGER OUTSTANDING.csv", **write_options)
+
+
+	##[TOLERANCE]----------------OUTPUT------------------##
+	##
+	if tolerance_match:
+		print(f"{output_dir}SETTLEMENT TOLERANCE MATCHED.csv")
+		spb_tolerance.sort_values(by=['Amount'], ascending=True).to_csv(f"{output_dir}SETTLEMENT TOLERANCE MATCHED.csv", **write_options)
+
+		print(f"{output_dir}LEDGER TOLERANCE MATCHED.csv")
+		ledger_tolerance.sort_values(by=['Amount'], ascending=True).to_csv(f"{output_dir}LEDGER TOLERANCE MATCHED.csv", **write_options)
+
+		print(f"{output_dir}TOLERANCE PAIRS.csv")
+		tolerance_pairs.to_csv(f"{output_dir}TOLERANCE PAIRS.csv", **write_options)
 
 
 
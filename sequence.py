@@ -3,34 +3,40 @@ import document_reconciliation.actions.mutations as mutate
 import document_reconciliation.actions.generators as generator
 
 
+'''
+	"memoize_on" declares the columns a generator reads. When the generator has no column-level implementation,
+	create_calculated_column evaluates it once per distinct combination of these columns instead of once per row.
+	The generators below all have one (see generators.vectorized), so none of them declare it.
+'''
+
 
 ledger_sequence = [
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "stan",
-			"generator": generator.ledger_stan_generator
+			"generator": generator.ledger_stan_generator,
 		}
 	},
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "remarks",
-			"generator": generator.ledger_remark_generator
+			"generator": generator.ledger_remark_generator,
 		}
 	},
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "transaction_id",
-			"generator": generator.ledger_tx_id_generator
+			"generator": generator.ledger_tx_id_generator,
 		}
 	},
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "secondary_transaction_id",
-			"generator": generator.generate_from_combination(['rrn', 'amt.lcy'])
+			"generator": generator.generate_from_combination(['rrn', 'amt.lcy']),
 		}
 	},
 	{
@@ -44,7 +50,9 @@ ledger_sequence = [
 		"action": mutate.format_date_time,
 		"params": {
 			"col_names": ["booking.date", "val.date"],
-			"dt_format": '%d-%b-%y'
+			"input_format": '%Y%m%d',
+			#Kept as datetime64 and formatted with the "date_format" of the output when written
+			"defer": True,
 		}
 	},
 ]
@@ -57,21 +65,21 @@ spb_sequence = [
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "remarks",
-			"generator": generator.spb_remark_generator
+			"generator": generator.spb_remark_generator,
 		}
 	},
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "transaction_id",
-			"generator": generator.spb_tx_id_generator
+			"generator": generator.spb_tx_id_generator,
 		}
 	},
 	{
 		"action": mutate.create_calculated_column,
 		"params": {
 			"col_name": "secondary_transaction_id",
-			"generator": generator.generate_from_combination(['retrieval_reference_nr', 'settlement_impact'])
+			"generator": generator.generate_from_combination(['retrieval_reference_nr', 'settlement_impact']),
 		}
 	},
 	{
@@ -85,7 +93,9 @@ spb_sequence = [
 		"action": mutate.format_date_time,
 		"params": {
 			"col_names": ["datetime", "local_date_time"],
-			"dt_format": '%d-%b-%y'
+			"input_format": '%Y-%m-%d %H:%M:%S',
+			#Kept as datetime64 and formatted with the "date_format" of the output when written
+			"defer": True,
 		}
 	},
 ]
\ No newline at end of file
@@ -25,6 +25,8 @@
 
 '''
 
+import os
+
 import document_reconciliation.actions.mutations as mutate
 import document_reconciliation.actions.generators as generator
 
@@ -40,32 +42,94 @@ PROCESS_DESC = "Sterling Bank Reconciliation"
 default_document_section = "__default__"
 
 
+
+'''
+	The pool of worker processes shared by all documents for applying mutations.
+		"processes": The number of worker processes. None to use one per CPU core.
+		"start_method": The multiprocessing start method, "forkserver" is used where available.
+		"preload": Modules imported once by the forkserver instead of by every worker.
+		"fuse_mutations": Send each chunk to the pool once and run every mutation of a sequence on it there,
+			rather than making a trip per mutation. Barrier mutations (see mutate.barrier) split the sequence.
+		"parallel_reads": Read the files of the input folders concurrently, the largest first.
+		"shared_memory": Pass chunks to and from the workers in shared memory blocks, sending only a descriptor of
+			each block through the pool, instead of pickling the chunks through its pipes.
+'''
+EXECUTOR = {
+	"processes": 4,
+	"start_method": "forkserver",
+	"preload": [
+		"pandas",
+		"document_reconciliation.actions.mutations",
+		"document_reconciliation.actions.generators",
+	],
+	"fuse_mutations": True,
+	"parallel_reads": True,
+	"shared_memory": True,
+}
+
+
+'''
+	An on-disk cache of the documents as read and mutated (see core.cache), so rerunning the same inputs only
+	re-reads the files whose content, read options or read mutations changed. Needs pyarrow.
+		"path": The cache directory. None to disable the cache. By default it is in the user's cache directory, so
+			the cache is shared by every run whatever directory it is started from.
+		"max_bytes": The least recently used entries are evicted to keep the cache under this size. None for no limit.
+		"incremental": Keep a manifest (path, size, mtime and hash) of the files of the input folders, so that files
+			unchanged since a previous run are loaded from the cache without being hashed or parsed.
+'''
+CACHE = {
+	"path": os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "document_reconciliation"),
+	"max_bytes": 2 * 1024 ** 3,
+	"incremental": True,
+}
+
+
+'''
+	How amounts are held.
+		"minor_units": Convert the amount columns of each input ("amount_cols" in its "ingest" config) to int64 minor
+			units (e.g. kobo) as they are read, so that totals, netting of reversals and matching on amounts use exact
+			integer arithmetic. They are rendered as decimals again only for generators and when written.
+			False to keep them as floats.
+		"scale": The number of minor units in one unit of currency.
+'''
+AMOUNTS = {
+	"minor_units": True,
+	"scale": 100,
+}
+
+
+'''
+	The columns to read from the ledger and SPB files, and their types.
+	Low cardinality columns are read as "category" and the rest of the strings as Arrow backed strings
+	("string[pyarrow]", Python strings when pyarrow is not installed). Numeric columns can be declared
+	as "integer", "signed", "unsigned" or "float" to be downcast to the smallest type that holds them.
+'''
 LEDGER_READ_COLS = {
-	'booking.date': str,
-	'val.date': str,
+	'booking.date': 'category',
+	'val.date': 'category',
 	'amt.lcy': float,
-	'narrative': str,
-	'at.unique.id': str,
-	'our.ref': str,
-	'rrn': str,
-	'pan.number': str,
-	'terminal.id': str,
-	'auth.code': str,
+	'narrative': 'string[pyarrow]',
+	'at.unique.id': 'string[pyarrow]',
+	'our.ref': 'string[pyarrow]',
+	'rrn': 'string[pyarrow]',
+	'pan.number': 'string[pyarrow]',
+	'terminal.id': 'category',
+	'auth.code': 'string[pyarrow]',
 }
 
 
 SPB_READ_COLS = {
-	'retrieval_reference_nr': str, 
-	'stan': str,
-	'pan': str,
-	'terminal_id': str,
+	'retrieval_reference_nr': 'string[pyarrow]', 
+	'stan': 'string[pyarrow]',
+	'pan': 'string[pyarrow]',
+	'terminal_id': 'category',
 	'settlement_impact': float,
-	'settlement_impact_desc': str,
-	'trxn_category': str,
-	'local_date_time': str,
-	'datetime': str,
-	'message_type': str,
-	'auth_id': str,
+	'settlement_impact_desc': 'category',
+	'trxn_category': 'category',
+	'local_date_time': 'string[pyarrow]',
+	'datetime': 'string[pyarrow]',
+	'message_type': 'category',
+	'auth_id': 'string[pyarrow]',
 }
 
 
@@ -89,6 +153,20 @@ PROCESS_INPUTS = {
 
 					"write": {},
 				},
+
+				#Stop reading (and fail) if the accumulated chunks exceed this many bytes. None to disable.
+				#Print the memory used by each column before and after compact types if "report_memory" is set.
+				#"amount_cols" are held in minor units if AMOUNTS["minor_units"] is set.
+				#"engine" reads the file with a faster reader (see core.documents.engines), the chunked pandas reader is
+				#used if it isn't installed or doesn't support the read options.
+				#Without an engine, "mmap" parses the file in parallel, in byte ranges of the memory-mapped file.
+				"ingest": {
+					"memory_limit": None,
+					"report_memory": False,
+					"amount_cols": ['amt.lcy'],
+					"engine": None,
+					"mmap": True,
+				},
 			},
 
 			"mutations": {
@@ -129,6 +207,9 @@ PROCESS_INPUTS = {
 	                        "read": {},
 	                        "write": {}
 	                    },
+	                    "ingest": {
+	                        "engine": None,
+	                    },
 	                },
 	                "mutations": {
 	                    "read": [],
@@ -143,6 +224,9 @@ PROCESS_INPUTS = {
 	                        "read": {},
 	                        "write": {}
 	                    },
+	                    "ingest": {
+	                        "engine": None,
+	                    },
 	                },
 	                "mutations": {
 	                    "read": [],
@@ -226,6 +310,12 @@ PROCESS_OUTPUTS = {
 			"info": "The output directory.",
 			"config": {
 				"create_if_not_exist": True,
+				"pandas": {
+					"write": {
+						"index": False,
+						"date_format": '%d-%b-%y',
+					},
+				},
 			},
 		},
 	},
@@ -280,6 +370,10 @@ GROUPING = [
 				},
 				"write": {},
 			},
+			"ingest": {
+				"amount_cols": ['settlement_impact'],
+				"engine": "pyarrow",
+			},
 		},
 		"mutations": {
 			"read": [
@@ -308,4 +402,31 @@ GROUPING = [
 			"write": [],
 		}
 	},
-]
\ No newline at end of file
+]
+
+
+
+'''
+	Options for the reconciliation itself.
+		"key_encoding": Encode the transaction ids to 64-bit integers for matching, "dictionary" or "hash" (see KeyEncoder).
+			None to match on the strings.
+		"reversal_tolerance": Duplicate entries whose amounts net to zero within this amount are treated as reversals.
+			With amounts in minor units (see AMOUNTS) it is rounded to whole minor units, i.e. 0.005 means exactly zero.
+		"match_tiers": The key columns entries are matched on, in order. Entries left outstanding after
+			matching on one key are matched on the next.
+		"tolerance": Pairs entries still outstanding after "match_tiers" that share their "block_on" value (e.g. "rrn"),
+			whose "amount_col" values differ by at most "amount" and whose "date_col" values are at most "days" apart
+			(see ToleranceMatcher). The pairs are near matches for review: they are written to the TOLERANCE outputs,
+			not with the reconciled entries. None to disable, e.g.
+				{"block_on": "rrn", "amount_col": "Amount", "date_col": "Valdate", "amount": 0.01, "days": 1}
+		"split": Matches an entry still outstanding with two or more entries on the other side with the same "group_on"
+			value whose amounts add up to its amount (see SplitMatcher). None to disable, e.g.
+				{"group_on": "rrn", "amount_col": "Amount", "tolerance": 0, "max_group_size": 12, "max_nodes": 10000}
+'''
+RECONCILIATION = {
+	"key_encoding": "dictionary",
+	"reversal_tolerance": 0.005,
+	"match_tiers": ["transaction_id", "secondary_transaction_id"],
+	"tolerance": None,
+	"split": None,
+}